@@ -1,19 +1,53 @@
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, Response, request, jsonify, send_file
 import os
 import uuid
-import sqlite3
-import json
-import cv2
 from datetime import datetime
-import hashlib
 import mimetypes
-import subprocess
-import numpy as np
+import time
+import queue
+import shutil
+import sqlite3
+from urllib.parse import quote
+from werkzeug.security import safe_join
+
+from config import (MEDIA_ROOT, DATABASE_PATH, MAX_UPLOAD_BYTES, FFMPEG_BIN, READY_MAX_QUEUED_JOBS,
+                    EVENTS_POLL_INTERVAL, EVENTS_HEARTBEAT_SECONDS, EVENTS_STREAM_SECONDS, MEDIA_OFFLOAD,
+                    MEDIA_ACCEL_PREFIX, UPLOAD_SESSION_TTL, UPLOAD_MAX_OPEN_SESSIONS, SPRITE_FRAMES)
+from processing import get_video_info, choose_segment_count, link_or_copy, PROCESSING_MODES
+from jobs import (init_jobs_table, init_renditions_table, enqueue_job, get_job, start_worker_pool,
+                  count_queued_jobs, count_jobs_by_status, JOB_QUEUED, JOB_FAILED, JOB_RENDITIONS)
+from metrics import (stage_timer, observe_stage, render_metrics, reset_metrics_dir, INGESTED_BYTES,
+                     SERVED_BYTES)
+from database import get_connection, release_connection, enable_wal, id_prefix_range
+from videos import (VIDEO_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, video_to_dict, list_videos_page,
+                    parse_fields, decode_cursor, init_video_stats, library_stats)
+from filters import normalize_chain, parse_chain, chain_slug
+from thumbcache import init_thumbnail_cache_table, parse_thumbnail_size, resized_thumbnail, thumbnail_mimetype
+from events import (init_events_table, publish_event, event_bounds, events_since, format_event, EVENT_BROADCASTER,
+                    EVENT_VIDEO_ADDED, EVENT_VIDEO_DELETED, EVENT_RESET)
+from ingest import (IngestRequest, cleanup_ingest_files, init_upload_tables, expire_upload_sessions,
+                    count_open_upload_sessions, create_upload_file, write_chunk, received_ranges, UPLOAD_OPEN,
+                    UPLOAD_FINALIZING, UPLOAD_FINALIZED)
 
 app = Flask(__name__)
+# Uploads gravados em disco em blocos, com hash calculado durante a recepção
+app.request_class = IngestRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES or None
 
-MEDIA_ROOT = "media"
-DATABASE_PATH = "data/videos.db"
+# Vídeos de um id nunca mudam depois de gravados; thumbnails são revalidadas diariamente
+MEDIA_MAX_AGE = 365 * 24 * 3600
+THUMBNAIL_MAX_AGE = 24 * 3600
+
+# Painel web: vídeos por página e colunas usadas nos cards
+DASHBOARD_PAGE_SIZE = 24
+DASHBOARD_FIELDS = ('id', 'original_name', 'original_ext', 'size_bytes', 'duration_sec', 'width', 'height',
+                    'filter', 'created_at')
+# Quadros do sprite de hover pedidos por upload (sprite_frames); sem o campo vale SPRITE_FRAMES
+MAX_SPRITE_FRAMES = 100
+HLS_MIMETYPES = {'.m3u8': 'application/vnd.apple.mpegurl', '.ts': 'video/mp2t'}
+MEDIA_OFFLOAD_MODES = ('', 'x-accel', 'x-sendfile')
+if MEDIA_OFFLOAD not in MEDIA_OFFLOAD_MODES:
+    raise ValueError('MEDIA_OFFLOAD must be empty, "x-accel" or "x-sendfile"')
 
 def init_database():
     # Criar diretório de dados se não existir
@@ -23,7 +57,8 @@ def init_database():
     if not os.path.exists(DATABASE_PATH):
        open(DATABASE_PATH, 'w').close()        
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
+    enable_wal(conn)
     cursor = conn.cursor()
     
     # Criar tabela com estrutura nova
@@ -43,7 +78,9 @@ def init_database():
             path_original TEXT,
             path_processed TEXT,
             is_deleted INTEGER DEFAULT 0,
-            deleted_at TEXT
+            deleted_at TEXT,
+            checksum TEXT,
+            checksum_blake2b TEXT
         )
     ''')
     
@@ -59,8 +96,39 @@ def init_database():
         cursor.execute('ALTER TABLE videos ADD COLUMN deleted_at TEXT')
         print("Adicionada coluna deleted_at")
     
+    if 'checksum' not in columns:
+        cursor.execute('ALTER TABLE videos ADD COLUMN checksum TEXT')
+        print("Adicionada coluna checksum")
+    
+    if 'checksum_blake2b' not in columns:
+        cursor.execute('ALTER TABLE videos ADD COLUMN checksum_blake2b TEXT')
+        print("Adicionada coluna checksum_blake2b")
+    
+    # Índice de conteúdo: originais por hash e saídas por (hash, filtro)
+    cursor.execute('DROP INDEX IF EXISTS idx_videos_checksum_filter')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_blake2b_filter ON videos (checksum_blake2b, filter)')
+    
+    # Índices das listagens: ativos por data (com id para desempate) e por filtro
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_videos_deleted_created
+        ON videos (is_deleted, created_at DESC, id DESC)
+    ''')
+    # (is_deleted, filter, ...) também atende a contagem de filtros distintos
+    cursor.execute('DROP INDEX IF EXISTS idx_videos_deleted_filter')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_videos_deleted_filter_created
+        ON videos (is_deleted, filter, created_at DESC, id DESC)
+    ''')
+    
+    init_video_stats(cursor)
+    init_jobs_table(cursor)
+    init_renditions_table(cursor)
+    init_thumbnail_cache_table(cursor)
+    init_events_table(cursor)
+    init_upload_tables(cursor)
+    expire_upload_sessions(cursor, UPLOAD_SESSION_TTL)
+    
     conn.commit()
-    conn.close()
 
 def create_directory_structure(video_id, date_obj):
     year = date_obj.strftime('%Y')
@@ -76,230 +144,578 @@ def create_directory_structure(video_id, date_obj):
     
     return base_path
 
-def get_video_info(video_path):
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    duration = frame_count / fps if fps > 0 else 0
-    cap.release()
-    return duration, fps, width, height
-
-def apply_filter(input_path, output_path, filter_type):
-    # Passo 1: Extrair áudio do vídeo original
-    temp_audio_path = output_path.replace('.mp4', '_temp_audio.aac')
-    temp_video_path = output_path.replace('.mp4', '_temp_video.mp4')
-    
-    # Extrair áudio usando ffmpeg
-    audio_extract_cmd = [
-        'ffmpeg', '-i', input_path, '-vn', '-acodec', 'copy', 
-        temp_audio_path, '-y'
-    ]
-    
+def parse_sprite_frames(value):
+    if value in (None, ''):
+        return SPRITE_FRAMES
     try:
-        subprocess.run(audio_extract_cmd, check=True, capture_output=True)
-        has_audio = True
-    except subprocess.CalledProcessError:
-        # Se falhar, o vídeo pode não ter áudio
-        has_audio = False
-    
-    # Passo 2: Processar vídeo com OpenCV (mantendo seu código atual)
-    cap = cv2.VideoCapture(input_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(temp_video_path, fourcc, fps, (width, height))
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if filter_type == 'grayscale':
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-        elif filter_type == 'blur':
-            frame = cv2.GaussianBlur(frame, (15, 15), 0)
-        elif filter_type == 'edge':
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, 100, 200)
-            frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-        elif filter_type == 'brightness':
-            frame = cv2.convertScaleAbs(frame, alpha=1.0, beta=50)
-        elif filter_type == 'sepia':
-            # Filtro sepia usando transformação de matriz
-            kernel = np.array([[0.272, 0.534, 0.131],
-                              [0.349, 0.686, 0.168],
-                              [0.393, 0.769, 0.189]])
-            frame = cv2.transform(frame, kernel)
-        
-        out.write(frame)
-    
-    cap.release()
-    out.release()
-    
-    # Passo 3: Combinar áudio e vídeo usando ffmpeg
-    if has_audio:
-        # Juntar vídeo processado com áudio original
-        combine_cmd = [
-            'ffmpeg', '-i', temp_video_path, '-i', temp_audio_path,
-            '-c:v', 'copy', '-c:a', 'aac', '-strict', 'experimental',
-            output_path, '-y'
-        ]
-        
-        try:
-            subprocess.run(combine_cmd, check=True, capture_output=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Erro ao combinar áudio e vídeo: {e}")
-            # Se falhar, pelo menos mantenha o vídeo sem áudio
-            os.rename(temp_video_path, output_path)
-    else:
-        # Se não há áudio, apenas renomeie o vídeo processado
-        os.rename(temp_video_path, output_path)
-    
-    # Limpar arquivos temporários
-    if os.path.exists(temp_audio_path):
-        os.remove(temp_audio_path)
-    if os.path.exists(temp_video_path):
-        os.remove(temp_video_path)
-
-def generate_thumbnail(video_path, thumb_path):
-    cap = cv2.VideoCapture(video_path)
-    ret, frame = cap.read()
-    if ret:
-        # Resize to thumbnail size
-        height, width = frame.shape[:2]
-        max_size = 150
-        if width > height:
-            new_width = max_size
-            new_height = int(height * max_size / width)
-        else:
-            new_height = max_size
-            new_width = int(width * max_size / height)
-        
-        thumbnail = cv2.resize(frame, (new_width, new_height))
-        cv2.imwrite(thumb_path, thumbnail)
-    cap.release()
+        frames = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('sprite_frames must be an integer')
+    if not 0 <= frames <= MAX_SPRITE_FRAMES:
+        raise ValueError(f'sprite_frames must be between 0 and {MAX_SPRITE_FRAMES}')
+    return frames
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
+    # Acessar request.files consome o corpo: é o tempo de recepção + hash do upload
+    started = time.perf_counter()
     file = request.files['video']
-    filter_type = request.form['filter']
+    try:
+        # Filtro único ou cadeia ("blur(sigma=3)|edge"), gravado na forma canônica
+        filter_type = normalize_chain(request.form['filter'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    observe_stage('ingest', filter_type, time.perf_counter() - started)
+    # single, segmented ou auto (segmenta automaticamente vídeos longos)
+    processing_mode = request.form.get('mode', 'auto')
+    if processing_mode not in PROCESSING_MODES:
+        return jsonify({'error': f'Invalid mode: {processing_mode}'}), 400
+    # hls=1 gera também playlist e segmentos HLS do vídeo processado
+    hls = request.form.get('hls', '').lower() in ('1', 'true', 'yes')
+    # sprite_frames=N gera a folha de N quadros para scrubbing no hover (0: nenhuma)
+    try:
+        sprite_frames = parse_sprite_frames(request.form.get('sprite_frames'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
+    # O arquivo já está em media/incoming: foi gravado em blocos durante a recepção
+    original_name, original_ext = os.path.splitext(file.filename)
+    file.stream.close()
+    INGESTED_BYTES.labels('upload').inc(file.stream.digests()['size_bytes'])
+    
+    result = register_upload(file.stream.path, original_name, original_ext, filter_type,
+                             processing_mode, file.stream.digests(), hls, sprite_frames)
+    return jsonify(result), 202
+
+def register_upload(temp_path, original_name, original_ext, filter_type, processing_mode, digests, hls=False,
+                    sprite_frames=SPRITE_FRAMES, upload_id=None):
+    # digests sem hash (uploads retomáveis): o job calcula e grava; upload_id encerra a sessão
+    # na mesma transação que registra o vídeo
     video_id = str(uuid.uuid4())
     created_at = datetime.now()
     
-    # Save to incoming
-    original_name, original_ext = os.path.splitext(file.filename)
-    temp_path = os.path.join(MEDIA_ROOT, "incoming", f"{video_id}{original_ext}")
-    os.makedirs(os.path.join(MEDIA_ROOT, "incoming"), exist_ok=True)
-    file.save(temp_path)
-    
     # Create structure
     base_path = create_directory_structure(video_id, created_at)
     
-    # Move to final location
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Move to final location, reaproveitando um original idêntico já armazenado
     original_path = os.path.join(base_path, "original", f"video{original_ext}")
-    os.rename(temp_path, original_path)
+    cursor.execute('SELECT path_original FROM videos WHERE checksum_blake2b = ? AND is_deleted = 0',
+                   (digests['blake2b'],))
+    existing_original = next((row[0] for row in cursor.fetchall() if os.path.exists(row[0])), None)
+    if existing_original:
+        link_or_copy(existing_original, original_path)
+        os.remove(temp_path)
+    else:
+        os.rename(temp_path, original_path)
     
     # Get video info
-    duration, fps, width, height = get_video_info(original_path)
-    size_bytes = os.path.getsize(original_path)
+    with stage_timer('probe', filter_type):
+        duration, fps, width, height = get_video_info(original_path)
+    size_bytes = digests['size_bytes']
     mime_type = mimetypes.guess_type(original_path)[0]
     
-    # Apply filter
-    os.makedirs(os.path.join(base_path, "processed", filter_type), exist_ok=True)
-    processed_path = os.path.join(base_path, "processed", filter_type, f"video{original_ext}")
-    apply_filter(original_path, processed_path, filter_type)
+    # O filtro é aplicado pelo pool de workers; aqui só registramos o job
+    processed_path = os.path.join(base_path, "processed", chain_slug(parse_chain(filter_type)), "video.mp4")
     
-    # Generate thumbnails for both original and processed
-    thumb_original_path = os.path.join(base_path, "thumbs", "original.jpg")
-    thumb_processed_path = os.path.join(base_path, "thumbs", "processed.jpg")
-    
-    generate_thumbnail(original_path, thumb_original_path)
-    generate_thumbnail(processed_path, thumb_processed_path)
-    
-    # Create metadata
-    metadata = {
-        'id': video_id,
-        'original_name': original_name,
+    # Save to database
+    db_started = time.perf_counter()
+    cursor.execute('''
+        INSERT INTO videos (id, original_name, original_ext, mime_type, size_bytes,
+                            duration_sec, fps, width, height, filter, created_at,
+                            path_original, path_processed, is_deleted, deleted_at,
+                            checksum, checksum_blake2b)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (video_id, original_name, original_ext, mime_type, size_bytes,
+          duration, fps, width, height, filter_type, created_at.isoformat(),
+          original_path, processed_path, 0, None,
+          digests['checksum'], digests['blake2b']))
+    job_id = enqueue_job(cursor, video_id, {
         'filter': filter_type,
+        'checksum': digests['checksum'],
+        'blake2b': digests['blake2b'],
+        'original_name': original_name,
         'created_at': created_at.isoformat(),
-        'checksum': hashlib.md5(open(original_path, 'rb').read()).hexdigest()
-    }
+        'base_path': base_path,
+        'original_path': original_path,
+        'processed_path': processed_path,
+        'segments': choose_segment_count(processing_mode, duration),
+        'hls': hls,
+        'sprite_frames': sprite_frames,
+    })
+    video = {'id': video_id, 'original_name': original_name, 'original_ext': original_ext, 'size_bytes': size_bytes,
+             'duration_sec': duration, 'width': width, 'height': height, 'filter': filter_type,
+             'created_at': created_at.isoformat()}
+    publish_event(cursor, EVENT_VIDEO_ADDED, video_id, video=video, job_id=job_id, stats=library_stats(cursor))
+    if upload_id:
+        cursor.execute('''
+            UPDATE upload_sessions SET status = ?, updated_at = ?, video_id = ?, job_id = ? WHERE id = ?
+        ''', (UPLOAD_FINALIZED, datetime.now().isoformat(), video_id, job_id, upload_id))
+        cursor.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+    conn.commit()
+    observe_stage('db_insert', filter_type, time.perf_counter() - db_started)
     
-    with open(os.path.join(base_path, "meta.json"), 'w') as f:
-        json.dump(metadata, f)
+    return {'success': True, 'video_id': video_id, 'job_id': job_id, 'status': 'queued',
+            'deduplicated': existing_original is not None}
+
+@app.route('/uploads', methods=['POST'])
+def create_upload_session():
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    filter_type = data.get('filter')
+    size_bytes = data.get('size')
+    processing_mode = data.get('mode', 'auto')
+    hls = bool(data.get('hls', False))
     
-    # Save to database
-    conn = sqlite3.connect(DATABASE_PATH)
+    if not filename or not filter_type or not isinstance(size_bytes, int) or size_bytes <= 0:
+        return jsonify({'error': 'filename, filter and size are required'}), 400
+    if processing_mode not in PROCESSING_MODES:
+        return jsonify({'error': f'Invalid mode: {processing_mode}'}), 400
+    try:
+        sprite_frames = parse_sprite_frames(data.get('sprite_frames'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        filter_type = normalize_chain(filter_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if MAX_UPLOAD_BYTES and size_bytes > MAX_UPLOAD_BYTES:
+        return jsonify({'error': 'File too large'}), 413
+    
+    conn = get_connection()
     cursor = conn.cursor()
+    # Sessões abandonadas liberam o disco pré-alocado e a vaga antes de contar as abertas
+    expire_upload_sessions(cursor, UPLOAD_SESSION_TTL)
+    conn.commit()
+    if UPLOAD_MAX_OPEN_SESSIONS and count_open_upload_sessions(cursor) >= UPLOAD_MAX_OPEN_SESSIONS:
+        return jsonify({'error': 'Too many open uploads'}), 429
+    
+    upload_id = str(uuid.uuid4())
+    original_name, original_ext = os.path.splitext(filename)
+    path = create_upload_file(upload_id, size_bytes)
+    
+    now = datetime.now().isoformat()
     cursor.execute('''
-        INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (video_id, original_name, original_ext, mime_type, size_bytes,
-          duration, fps, width, height, filter_type, created_at.isoformat(),
-          original_path, processed_path, 0, None))
+        INSERT INTO upload_sessions (id, original_name, original_ext, filter, mode,
+                                     size_bytes, path, status, created_at, hls, updated_at, sprite_frames)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (upload_id, original_name, original_ext, filter_type, processing_mode,
+          size_bytes, path, UPLOAD_OPEN, now, int(hls), now, sprite_frames))
+    conn.commit()
+    
+    return jsonify({'upload_id': upload_id, 'size': size_bytes, 'received_bytes': 0}), 201
+
+def load_upload_session(cursor, upload_id):
+    cursor.execute('''
+        SELECT id, original_name, original_ext, filter, mode, size_bytes, path, status, hls, sprite_frames,
+               video_id, job_id
+        FROM upload_sessions WHERE id = ?
+    ''', (upload_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    upload = dict(zip(('id', 'original_name', 'original_ext', 'filter', 'mode',
+                       'size_bytes', 'path', 'status', 'hls', 'sprite_frames', 'video_id', 'job_id'), row))
+    cursor.execute('SELECT offset, length FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+    upload['ranges'] = received_ranges(cursor.fetchall())
+    upload['received_bytes'] = sum(end - start for start, end in upload['ranges'])
+    return upload
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    conn = get_connection()
+    upload = load_upload_session(conn.cursor(), upload_id)
+    
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'upload': {key: upload[key] for key in
+                               ('id', 'size_bytes', 'status', 'ranges', 'received_bytes', 'video_id', 'job_id')}})
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    offset = request.headers.get('Upload-Offset', type=int)
+    length = request.content_length
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT size_bytes, path, status FROM upload_sessions WHERE id = ?', (upload_id,))
+    session = cursor.fetchone()
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    size_bytes, path, status = session
+    if status != UPLOAD_OPEN:
+        return jsonify({'error': 'Upload already finalized'}), 409
+    if offset is None or not length or offset < 0 or offset + length > size_bytes:
+        return jsonify({'error': 'Invalid Upload-Offset or Content-Length'}), 400
+    
+    written = write_chunk(path, offset, request.stream, length)
+    if written != length:
+        return jsonify({'error': 'Incomplete chunk', 'received': written}), 400
+    
+    cursor.execute('INSERT OR REPLACE INTO upload_chunks (upload_id, offset, length) VALUES (?, ?, ?)',
+                   (upload_id, offset, length))
+    cursor.execute('UPDATE upload_sessions SET updated_at = ? WHERE id = ?', (datetime.now().isoformat(), upload_id))
     conn.commit()
-    conn.close()
+    INGESTED_BYTES.labels('chunk').inc(written)
     
-    return jsonify({'success': True, 'video_id': video_id})
+    return jsonify({'success': True, 'offset': offset, 'length': length})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    upload = load_upload_session(cursor, upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    if upload['status'] == UPLOAD_FINALIZED:
+        # Finalize repetido (ex.: o cliente não recebeu a primeira resposta): devolve o mesmo vídeo e job
+        job = get_job(upload['job_id'])
+        return jsonify({'success': True, 'video_id': upload['video_id'], 'job_id': upload['job_id'],
+                        'status': job['status'] if job else JOB_QUEUED})
+    if upload['status'] == UPLOAD_FINALIZING:
+        return jsonify({'error': 'Upload is being finalized'}), 409
+    if upload['ranges'] != [[0, upload['size_bytes']]]:
+        return jsonify({'error': 'Upload incomplete', 'ranges': upload['ranges'],
+                        'received_bytes': upload['received_bytes']}), 409
+    
+    # Garante que só uma requisição finaliza a sessão; os blocos ficam até o vídeo estar registrado
+    cursor.execute('UPDATE upload_sessions SET status = ?, updated_at = ? WHERE id = ? AND status = ?',
+                   (UPLOAD_FINALIZING, datetime.now().isoformat(), upload_id, UPLOAD_OPEN))
+    claimed = cursor.rowcount == 1
+    conn.commit()
+    if not claimed:
+        return jsonify({'error': 'Upload is being finalized'}), 409
+    
+    try:
+        # Sem hash aqui: ler o upload inteiro prenderia a thread; o job calcula antes de filtrar
+        digests = {'checksum': None, 'blake2b': None, 'size_bytes': upload['size_bytes']}
+        result = register_upload(upload['path'], upload['original_name'], upload['original_ext'],
+                                 upload['filter'], upload['mode'], digests, bool(upload['hls']),
+                                 upload['sprite_frames'], upload_id=upload_id)
+    except Exception:
+        # Falhou antes de mover o arquivo: a sessão volta a aceitar blocos e um novo finalize
+        conn.rollback()
+        if os.path.exists(upload['path']):
+            cursor.execute('UPDATE upload_sessions SET status = ? WHERE id = ?', (UPLOAD_OPEN, upload_id))
+            conn.commit()
+        raise
+    return jsonify(result), 202
+
+@app.teardown_request
+def remove_partial_uploads(exc):
+    cleanup_ingest_files(request)
+    release_connection()
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Processo vivo: não toca no banco nem no disco
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {}
+    queued_jobs = None
+    try:
+        cursor = get_connection().cursor()
+        cursor.execute('SELECT 1')
+        checks['database'] = True
+        queued_jobs = count_queued_jobs(cursor)
+    except sqlite3.Error:
+        checks['database'] = False
+    checks['media_writable'] = os.access(MEDIA_ROOT, os.W_OK)
+    checks['ffmpeg'] = shutil.which(FFMPEG_BIN) is not None
+    # Fila acima do limite: a instância deixa de receber tráfego até esvaziar
+    checks['queue'] = queued_jobs is not None and queued_jobs <= READY_MAX_QUEUED_JOBS
+
+    ready = all(checks.values())
+    body = {'status': 'ready' if ready else 'unavailable', 'checks': checks, 'queued_jobs': queued_jobs}
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    data, content_type = render_metrics(count_jobs_by_status)
+    return Response(data, content_type=content_type)
+
+@app.route('/events', methods=['GET'])
+def stream_events():
+    # Server-Sent Events: Last-Event-ID (ou ?since=) retoma de onde o cliente parou; sem ele, só eventos novos
+    cursor = get_connection().cursor()
+    oldest, latest = event_bounds(cursor)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(last_event_id) if last_event_id else latest
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID must be an integer'}), 400
+    
+    # Novos eventos chegam pelo leitor compartilhado do processo; cada conexão prende uma thread do servidor
+    subscriber = EVENT_BROADCASTER.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many event streams'}), 503
+    
+    def generate():
+        seq = since
+        # Cada conexão dura EVENTS_STREAM_SECONDS; o EventSource reconecta sozinho com o último id
+        yield f"retry: {int(EVENTS_POLL_INTERVAL * 1000) + 1000}\n\n"
+        # Id anterior ao log (eventos já removidos) ou posterior a ele (banco recriado)
+        if seq < oldest - 1 or seq > latest:
+            seq = latest
+            yield format_event(latest, EVENT_RESET, '{}')
+        # O que o cliente perdeu até a inscrição vem do banco; daí em diante, da fila
+        while seq < subscriber.start_seq:
+            rows = events_since(cursor, seq)
+            if not rows:
+                break
+            for seq, event_type, data in rows:
+                yield format_event(seq, event_type, data)
+        started = last_write = time.monotonic()
+        while not subscriber.overflowed:
+            remaining = EVENTS_STREAM_SECONDS - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            try:
+                event_seq, event_type, data = subscriber.queue.get(timeout=min(EVENTS_HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                if time.monotonic() - last_write >= EVENTS_HEARTBEAT_SECONDS:
+                    # Comentário SSE: mantém proxies e clientes sabendo que a conexão está viva
+                    yield ": ping\n\n"
+                    last_write = time.monotonic()
+                continue
+            # A leitura do banco acima pode já ter entregado este evento
+            if event_seq > seq:
+                seq = event_seq
+                yield format_event(seq, event_type, data)
+                last_write = time.monotonic()
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Também quando o cliente sai antes do primeiro evento (o gerador nem chega a rodar)
+    response.call_on_close(lambda: EVENT_BROADCASTER.unsubscribe(subscriber))
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if job:
+        return jsonify({'job': job})
+    return jsonify({'error': 'Job not found'}), 404
+
+def optional_int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
 
 @app.route('/videos', methods=['GET'])
 def list_videos():
-    conn = sqlite3.connect(DATABASE_PATH)
+    # ?limit=&cursor=&fields=id,original_name&filter=&created_after=&created_before=&min_size=&max_size=
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit = optional_int_arg('limit') or DEFAULT_PAGE_SIZE
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        min_size = optional_int_arg('min_size')
+        max_size = optional_int_arg('max_size')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM videos WHERE is_deleted = 0 ORDER BY created_at DESC')
-    videos = cursor.fetchall()
-    conn.close()
+    videos, next_cursor = list_videos_page(cursor, fields, limit=max(1, min(limit, MAX_PAGE_SIZE)), after=after,
+                                           filter_type=request.args.get('filter') or None,
+                                           created_after=request.args.get('created_after') or None,
+                                           created_before=request.args.get('created_before') or None,
+                                           min_size=min_size, max_size=max_size)
     
-    return jsonify({'videos': videos})
+    return jsonify({'videos': videos, 'next_cursor': next_cursor})
 
 @app.route('/videos/<video_id>', methods=['GET'])
 def get_video(video_id):
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM videos WHERE id LIKE ?', (f'{video_id}%',))
+    cursor.execute(f'SELECT {", ".join(VIDEO_COLUMNS)} FROM videos WHERE id >= ? AND id < ?',
+                   id_prefix_range(video_id))
     video = cursor.fetchone()
-    conn.close()
     
     if video:
-        return jsonify({'video': video})
+        return jsonify({'video': video_to_dict(video)})
     return jsonify({'error': 'Video not found'}), 404
 
+RENDITION_COLUMNS = ('filter', 'slug', 'status', 'job_id', 'created_at', 'finished_at')
+
+def list_renditions(cursor, video_id):
+    cursor.execute(f'''
+        SELECT {", ".join(RENDITION_COLUMNS)} FROM renditions WHERE video_id = ? ORDER BY created_at
+    ''', (video_id,))
+    return [dict(zip(RENDITION_COLUMNS, row)) for row in cursor.fetchall()]
+
+@app.route('/videos/<video_id>/renditions', methods=['GET'])
+def get_renditions(video_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM videos WHERE id >= ? AND id < ? AND is_deleted = 0', id_prefix_range(video_id))
+    video = cursor.fetchone()
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    return jsonify({'renditions': list_renditions(cursor, video[0])})
+
+@app.route('/videos/<video_id>/renditions', methods=['POST'])
+def create_renditions(video_id):
+    # {"filters": ["sepia", "blur(sigma=3)|edge"]}: novas versões com um único decode do original
+    data = request.get_json(silent=True) or {}
+    requested = data.get('filters')
+    if not isinstance(requested, list) or not requested or not all(isinstance(f, str) for f in requested):
+        return jsonify({'error': 'filters must be a non-empty list of filter chains'}), 400
+    try:
+        filters = list(dict.fromkeys(normalize_chain(filter_type) for filter_type in requested))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, filter, path_original, checksum, checksum_blake2b FROM videos
+        WHERE id >= ? AND id < ? AND is_deleted = 0
+    ''', id_prefix_range(video_id))
+    video = cursor.fetchone()
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    video_full_id, primary_filter, original_path, checksum, blake2b = video
+    base_path = os.path.dirname(os.path.dirname(original_path))
+    
+    # O filtro principal e rendições já existentes (exceto as que falharam) não são refeitos
+    now = datetime.now().isoformat()
+    accepted = []
+    for filter_type in filters:
+        if filter_type == primary_filter:
+            continue
+        slug = chain_slug(parse_chain(filter_type))
+        path = os.path.join(base_path, "processed", slug, "video.mp4")
+        cursor.execute('''
+            INSERT INTO renditions (video_id, filter, slug, path, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (video_id, filter) DO UPDATE SET status = excluded.status,
+                created_at = excluded.created_at, finished_at = NULL
+            WHERE renditions.status = ?
+        ''', (video_full_id, filter_type, slug, path, JOB_QUEUED, now, JOB_FAILED))
+        if cursor.rowcount == 1:
+            accepted.append({'filter': filter_type, 'path': path})
+    
+    job_id = None
+    if accepted:
+        job_id = enqueue_job(cursor, video_full_id, {
+            'original_path': original_path,
+            'checksum': checksum,
+            'blake2b': blake2b,
+            'renditions': accepted,
+        }, kind=JOB_RENDITIONS)
+        cursor.execute(f'''
+            UPDATE renditions SET job_id = ? WHERE video_id = ? AND filter IN ({", ".join("?" * len(accepted))})
+        ''', [job_id, video_full_id] + [rendition['filter'] for rendition in accepted])
+    conn.commit()
+    
+    return jsonify({'job_id': job_id, 'renditions': list_renditions(cursor, video_full_id)}), 202 if job_id else 200
+
+def content_etag(checksum, *parts):
+    # ETag forte derivado do hash do original; sem hash, o Werkzeug gera um a partir de mtime/tamanho
+    if not checksum:
+        return True
+    return '-'.join((checksum,) + parts)
+
+def send_media(path, etag, kind, max_age=MEDIA_MAX_AGE, immutable=True, **kwargs):
+    # conditional=True: responde 304 para If-None-Match e 206 para Range
+    response = send_file(os.path.abspath(path), conditional=True, etag=etag, max_age=max_age, **kwargs)
+    if response.status_code in (200, 206) and response.content_length:
+        SERVED_BYTES.labels(kind).inc(response.content_length)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    if MEDIA_OFFLOAD and response.status_code in (200, 206):
+        offload_media(response, path)
+    return response
+
+def offload_media(response, path):
+    # O proxy reverso lê o arquivo e atende o Range sozinho; o Python só devolve os cabeçalhos
+    path = os.path.abspath(path)
+    if MEDIA_OFFLOAD == 'x-accel':
+        relative = os.path.relpath(path, os.path.abspath(MEDIA_ROOT))
+        if relative.split(os.sep, 1)[0] == os.pardir:
+            return
+        location = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + relative.replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = quote(location)
+    else:
+        response.headers['X-Sendfile'] = path
+    response.close()
+    response.response = []
+    response.status_code = 200
+    response.headers.pop('Content-Range', None)
+    response.headers.pop('Content-Length', None)
+
 @app.route('/download/<video_id>', methods=['GET'])
 def download_video(video_id):
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT path_processed FROM videos WHERE id LIKE ?', (f'{video_id}%',))
+    cursor.execute('''
+        SELECT path_processed, COALESCE(checksum_blake2b, checksum), filter
+        FROM videos WHERE id >= ? AND id < ?
+    ''', id_prefix_range(video_id))
     result = cursor.fetchone()
-    conn.close()
     
     if result and os.path.exists(result[0]):
-        return send_file(result[0], as_attachment=True)
+        return send_media(result[0], content_etag(result[1], result[2]), 'processed', as_attachment=True)
     return jsonify({'error': 'Video not found'}), 404
 
 @app.route('/download/<video_id>/original', methods=['GET'])
 def download_original_video(video_id):
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT path_original FROM videos WHERE id LIKE ?', (f'{video_id}%',))
+    cursor.execute('''
+        SELECT path_original, COALESCE(checksum_blake2b, checksum)
+        FROM videos WHERE id >= ? AND id < ?
+    ''', id_prefix_range(video_id))
     result = cursor.fetchone()
-    conn.close()
     
     if result and os.path.exists(result[0]):
-        return send_file(result[0], as_attachment=True)
+        return send_media(result[0], content_etag(result[1]), 'original', as_attachment=True)
     return jsonify({'error': 'Original video not found'}), 404
 
+@app.route('/download/<video_id>/renditions/<slug>', methods=['GET'])
+def download_rendition(video_id, slug):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT r.path, COALESCE(v.checksum_blake2b, v.checksum), r.filter
+        FROM videos v JOIN renditions r ON r.video_id = v.id
+        WHERE v.id >= ? AND v.id < ? AND v.is_deleted = 0 AND r.slug = ? AND r.status = 'done'
+    ''', id_prefix_range(video_id) + (slug,))
+    result = cursor.fetchone()
+    
+    if result and os.path.exists(result[0]):
+        return send_media(result[0], content_etag(result[1], result[2]), 'rendition', as_attachment=True)
+    return jsonify({'error': 'Rendition not found'}), 404
+
 @app.route('/thumbnail/<video_id>/<thumb_type>', methods=['GET'])
 def get_thumbnail(video_id, thumb_type):
-    conn = sqlite3.connect(DATABASE_PATH)
+    # ?w=&h=&fmt=webp: versão no tamanho exato pedido, servida do cache em disco
+    resize = None
+    if thumb_type in ('original', 'processed') and any(request.args.get(name) for name in ('w', 'h', 'fmt')):
+        try:
+            resize = parse_thumbnail_size(optional_int_arg('w'), optional_int_arg('h'),
+                                          request.args.get('fmt', '').lower())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT path_original FROM videos WHERE id LIKE ?', (f'{video_id}%',))
+    cursor.execute('''
+        SELECT path_original, COALESCE(checksum_blake2b, checksum), filter, id
+        FROM videos WHERE id >= ? AND id < ?
+    ''', id_prefix_range(video_id))
     result = cursor.fetchone()
-    conn.close()
     
     if result:
         original_path = result[0]
@@ -316,22 +732,60 @@ def get_thumbnail(video_id, thumb_type):
                 os.path.join(base_path, "thumbs", "processed.jpg"),
                 os.path.join(base_path, "thumbs", "frame_0001.jpg")
             ]
+        elif thumb_type in ('sprite', 'sprite.json'):
+            # Folha de quadros para hover e sua grade (quadros, colunas, tamanho e intervalo)
+            thumb_paths = [os.path.join(base_path, "thumbs", "sprite.jpg" if thumb_type == 'sprite' else thumb_type)]
         
         for thumb_path in thumb_paths:
             if os.path.exists(thumb_path):
-                return send_file(thumb_path)
+                # Thumbnails podem ser regeneradas: cache com revalidação, não imutável
+                etag_parts = ('thumb', thumb_type, os.path.basename(thumb_path))
+                kwargs = {}
+                if resize:
+                    width, height, fmt = resize
+                    try:
+                        thumb_path = resized_thumbnail(conn, result[3], thumb_type, thumb_path, width, height, fmt)
+                    except ValueError as e:
+                        # O OpenCV desta instalação não codifica o formato pedido
+                        return jsonify({'error': str(e)}), 415
+                    if thumb_path is None:
+                        # Origem ilegível: tenta a próxima candidata, senão 404
+                        continue
+                    etag_parts += (f"{width or ''}x{height or ''}", fmt)
+                    kwargs['mimetype'] = thumbnail_mimetype(fmt)
+                etag = content_etag(result[1], result[2], *etag_parts)
+                return send_media(thumb_path, etag, 'thumbnail', max_age=THUMBNAIL_MAX_AGE, immutable=False, **kwargs)
     
     return jsonify({'error': 'Thumbnail not found'}), 404
 
+@app.route('/hls/<video_id>/<path:filename>', methods=['GET'])
+def get_hls_file(video_id, filename):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT path_processed, COALESCE(checksum_blake2b, checksum), filter
+        FROM videos WHERE id >= ? AND id < ?
+    ''', id_prefix_range(video_id))
+    result = cursor.fetchone()
+    
+    if result:
+        hls_dir = os.path.join(os.path.dirname(result[0]), "hls")
+        hls_path = safe_join(hls_dir, filename)
+        if hls_path and os.path.isfile(hls_path):
+            mimetype = HLS_MIMETYPES.get(os.path.splitext(hls_path)[1])
+            etag = content_etag(result[1], result[2], 'hls', filename.replace('/', '-'))
+            return send_media(hls_path, etag, 'hls', mimetype=mimetype)
+    
+    return jsonify({'error': 'HLS stream not found'}), 404
+
 @app.route('/videos/<video_id>/delete', methods=['POST'])
 def move_to_trash(video_id):
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM videos WHERE id LIKE ? AND is_deleted = 0', (f'{video_id}%',))
+    cursor.execute('SELECT * FROM videos WHERE id >= ? AND id < ? AND is_deleted = 0', id_prefix_range(video_id))
     video = cursor.fetchone()
     
     if not video:
-        conn.close()
         return jsonify({'error': 'Video not found or already deleted'}), 404
     
     # Dados do vídeo
@@ -356,19 +810,17 @@ def move_to_trash(video_id):
         trash_video_dir = os.path.join(trash_base_path, "video_data")
         
         if os.path.exists(video_base_dir):
-            import shutil
             shutil.move(video_base_dir, trash_video_dir)
         
         # Atualizar banco de dados
         cursor.execute('UPDATE videos SET is_deleted = 1, deleted_at = ? WHERE id = ?', 
                       (deleted_at.isoformat(), video_full_id))
+        publish_event(cursor, EVENT_VIDEO_DELETED, video_full_id, stats=library_stats(cursor))
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Video moved to trash', 'trash_path': trash_base_path})
         
     except Exception as e:
-        conn.close()
         return jsonify({'error': f'Failed to move video to trash: {str(e)}'}), 500
 
 # Template HTML para a interface web
@@ -474,6 +926,25 @@ HTML_TEMPLATE = """
             object-fit: cover;
         }
         
+        .video-thumbnail .sprite {
+            position: absolute;
+            left: 0;
+            width: 100%;
+            background-repeat: no-repeat;
+            display: none;
+        }
+        
+        .video-thumbnail .job-status {
+            position: absolute;
+            bottom: 10px;
+            left: 10px;
+            background: rgba(0,0,0,0.7);
+            color: white;
+            padding: 5px 10px;
+            border-radius: 15px;
+            font-size: 0.8em;
+        }
+        
         .video-thumbnail .no-thumb {
             color: #999;
             font-size: 3em;
@@ -552,6 +1023,13 @@ HTML_TEMPLATE = """
             background-color: #c82333;
         }
         
+        .pagination {
+            display: flex;
+            justify-content: center;
+            gap: 10px;
+            margin-top: 30px;
+        }
+        
         .no-videos {
             text-align: center;
             padding: 50px;
@@ -583,15 +1061,15 @@ HTML_TEMPLATE = """
             
             <div class="stats">
                 <div class="stat-item">
-                    <div class="stat-number">{{ total_videos }}</div>
+                    <div class="stat-number" id="stat-videos">{{ total_videos }}</div>
                     <div class="stat-label">Total de Vídeos</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-number">{{ total_filters }}</div>
+                    <div class="stat-number" id="stat-filters">{{ total_filters }}</div>
                     <div class="stat-label">Filtros Únicos</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-number">{{ total_size_mb }}MB</div>
+                    <div class="stat-number" id="stat-size">{{ total_size_mb }}MB</div>
                     <div class="stat-label">Espaço Utilizado</div>
                 </div>
             </div>
@@ -600,35 +1078,41 @@ HTML_TEMPLATE = """
         {% if videos %}
         <div class="videos-grid">
             {% for video in videos %}
-            <div class="video-card">
-                <div class="video-thumbnail">
-                    <img src="/thumbnail/{{ video[0] }}/processed" 
-                         alt="Thumbnail do vídeo {{ video[1] }}"
+            <div class="video-card" data-video-id="{{ video.id }}">
+                <div class="video-thumbnail" data-video-id="{{ video.id }}">
+                    <div class="sprite"></div>
+                    <img src="/thumbnail/{{ video.id }}/processed" loading="lazy"
+                         alt="Thumbnail do vídeo {{ video.original_name }}"
                          onerror="this.style.display='none'; this.nextElementSibling.style.display='block';">
                     <div class="no-thumb" style="display: none;">🎥</div>
-                    <div class="filter-badge">{{ video[9] }}</div>
+                    <div class="filter-badge">{{ video.filter }}</div>
                 </div>
                 <div class="video-info">
-                    <div class="video-title">{{ video[1] }}{{ video[2] }}</div>
+                    <div class="video-title">{{ video.original_name }}{{ video.original_ext }}</div>
                     <div class="video-details">
-                        <div><strong>Duração:</strong> {{ "%.1f"|format(video[5]) }}s</div>
-                        <div><strong>Resolução:</strong> {{ video[7] }}x{{ video[8] }}</div>
-                        <div><strong>Tamanho:</strong> {{ "%.1f"|format(video[4]/1024/1024) }}MB</div>
-                        <div><strong>Criado em:</strong> {{ video[10][:19].replace('T', ' ') }}</div>
+                        <div><strong>Duração:</strong> {{ "%.1f"|format(video.duration_sec) }}s</div>
+                        <div><strong>Resolução:</strong> {{ video.width }}x{{ video.height }}</div>
+                        <div><strong>Tamanho:</strong> {{ "%.1f"|format(video.size_bytes/1024/1024) }}MB</div>
+                        <div><strong>Criado em:</strong> {{ video.created_at[:19].replace('T', ' ') }}</div>
                     </div>
                     <div>
                         <p>Downloads</p>
                         <div class="video-actions">
-                            <a href="/download/{{ video[0] }}" class="btn btn-primary">📥 Filtro</a>
-                            <a href="/download/{{ video[0] }}/original" class="btn btn-secondary">📄 Original</a>
-                            <button onclick="deleteVideo('{{ video[0] }}')" class="btn btn-danger">🗑️ Excluir</button>
+                            <a href="/download/{{ video.id }}" class="btn btn-primary">📥 Filtro</a>
+                            <a href="/download/{{ video.id }}/original" class="btn btn-secondary">📄 Original</a>
+                            <button onclick="deleteVideo('{{ video.id }}')" class="btn btn-danger">🗑️ Excluir</button>
                         </div>
                     </div>
                 </div>
             </div>
             {% endfor %}
         </div>
+        <div class="pagination">
+            {% if paginated %}<a href="/" class="btn btn-secondary">⏮ Mais recentes</a>{% endif %}
+            {% if next_cursor %}<a href="/?cursor={{ next_cursor|urlencode }}" class="btn btn-primary">Próxima página ▶</a>{% endif %}
+        </div>
         {% else %}
+        <div class="videos-grid"></div>
         <div class="no-videos">
             <div>📹</div>
             <h3>Nenhum vídeo encontrado</h3>
@@ -637,7 +1121,157 @@ HTML_TEMPLATE = """
         {% endif %}
     </div>
     
+    <!-- Card de vídeo que chega por /events; preenchido via textContent -->
+    <template id="video-card-template">
+        <div class="video-card">
+            <div class="video-thumbnail">
+                <div class="sprite"></div>
+                <img loading="lazy" style="display: none;">
+                <div class="no-thumb">🎥</div>
+                <div class="filter-badge" data-field="filter"></div>
+                <div class="job-status">Na fila</div>
+            </div>
+            <div class="video-info">
+                <div class="video-title" data-field="title"></div>
+                <div class="video-details">
+                    <div><strong>Duração:</strong> <span data-field="duration"></span></div>
+                    <div><strong>Resolução:</strong> <span data-field="resolution"></span></div>
+                    <div><strong>Tamanho:</strong> <span data-field="size"></span></div>
+                    <div><strong>Criado em:</strong> <span data-field="created"></span></div>
+                </div>
+                <div>
+                    <p>Downloads</p>
+                    <div class="video-actions">
+                        <a class="btn btn-primary" data-link="processed">📥 Filtro</a>
+                        <a class="btn btn-secondary" data-link="original">📄 Original</a>
+                        <button class="btn btn-danger">🗑️ Excluir</button>
+                    </div>
+                </div>
+            </div>
+        </div>
+    </template>
+    
     <script>
+        // Scrubbing no hover: a posição do mouse escolhe um quadro do sprite do vídeo
+        const sprites = {};
+        
+        function loadSprite(videoId) {
+            if (!(videoId in sprites)) {
+                sprites[videoId] = fetch(`/thumbnail/${videoId}/sprite.json`)
+                    .then(response => response.ok ? response.json() : null)
+                    .catch(() => null);
+            }
+            return sprites[videoId];
+        }
+        
+        function bindScrub(thumbnail) {
+            const videoId = thumbnail.dataset.videoId;
+            const layer = thumbnail.querySelector('.sprite');
+            thumbnail.addEventListener('mousemove', event => {
+                loadSprite(videoId).then(sprite => {
+                    if (!sprite) return;
+                    const box = thumbnail.getBoundingClientRect();
+                    const scale = box.width / sprite.tile_width;
+                    const frame = Math.min(sprite.frames - 1,
+                        Math.floor((event.clientX - box.left) / box.width * sprite.frames));
+                    const height = sprite.tile_height * scale;
+                    layer.style.top = `${(box.height - height) / 2}px`;
+                    layer.style.height = `${height}px`;
+                    layer.style.backgroundImage = `url(/thumbnail/${videoId}/sprite)`;
+                    layer.style.backgroundSize = `${sprite.columns * box.width}px auto`;
+                    layer.style.backgroundPosition = `${-(frame % sprite.columns) * box.width}px ` +
+                        `${-Math.floor(frame / sprite.columns) * height}px`;
+                    layer.style.display = 'block';
+                });
+            });
+            thumbnail.addEventListener('mouseleave', () => { layer.style.display = 'none'; });
+        }
+        
+        document.querySelectorAll('.video-thumbnail[data-video-id]').forEach(bindScrub);
+        
+        // Atualizações incrementais: novos vídeos, progresso dos jobs, exclusões e estatísticas
+        const grid = document.querySelector('.videos-grid');
+        const paginated = {{ 'true' if paginated else 'false' }};
+        
+        function findCard(videoId) {
+            return grid.querySelector(`.video-card[data-video-id="${videoId}"]`);
+        }
+        
+        function updateStats(stats) {
+            document.getElementById('stat-videos').textContent = stats.total_videos;
+            document.getElementById('stat-filters').textContent = stats.total_filters;
+            document.getElementById('stat-size').textContent = `${(stats.total_bytes / 1024 / 1024).toFixed(1)}MB`;
+        }
+        
+        function setJobStatus(videoId, text) {
+            const card = findCard(videoId);
+            const status = card && card.querySelector('.job-status');
+            if (!status) return;
+            if (text) {
+                status.textContent = text;
+            } else {
+                status.remove();
+            }
+        }
+        
+        function addCard(video) {
+            const card = document.getElementById('video-card-template').content.firstElementChild.cloneNode(true);
+            const field = name => card.querySelector(`[data-field="${name}"]`);
+            card.dataset.videoId = video.id;
+            card.querySelector('.video-thumbnail').dataset.videoId = video.id;
+            field('filter').textContent = video.filter;
+            field('title').textContent = `${video.original_name}${video.original_ext}`;
+            field('duration').textContent = `${(video.duration_sec || 0).toFixed(1)}s`;
+            field('resolution').textContent = `${video.width}x${video.height}`;
+            field('size').textContent = `${(video.size_bytes / 1024 / 1024).toFixed(1)}MB`;
+            field('created').textContent = video.created_at.slice(0, 19).replace('T', ' ');
+            card.querySelector('[data-link="processed"]').href = `/download/${video.id}`;
+            card.querySelector('[data-link="original"]').href = `/download/${video.id}/original`;
+            card.querySelector('.btn-danger').addEventListener('click', () => deleteVideo(video.id));
+            bindScrub(card.querySelector('.video-thumbnail'));
+            const empty = document.querySelector('.no-videos');
+            if (empty) empty.remove();
+            grid.prepend(card);
+        }
+        
+        function showThumbnail(videoId) {
+            const card = findCard(videoId);
+            if (!card) return;
+            const img = card.querySelector('.video-thumbnail img');
+            img.onload = () => {
+                img.style.display = '';
+                card.querySelector('.no-thumb').style.display = 'none';
+            };
+            img.src = `/thumbnail/${videoId}/processed?t=${Date.now()}`;
+            delete sprites[videoId];
+        }
+        
+        if (window.EventSource) {
+            const events = new EventSource('/events');
+            const on = (type, handler) => events.addEventListener(type, event => handler(JSON.parse(event.data)));
+            on('video_added', data => {
+                updateStats(data.stats);
+                // Páginas antigas não recebem cards novos no topo
+                if (!paginated && !findCard(data.video_id)) addCard(data.video);
+            });
+            on('video_deleted', data => {
+                updateStats(data.stats);
+                const card = findCard(data.video_id);
+                if (card) card.remove();
+            });
+            on('job_progress', data => {
+                if (data.frames_total) {
+                    setJobStatus(data.video_id, `${Math.floor(100 * data.frames_done / data.frames_total)}%`);
+                }
+            });
+            on('job_done', data => {
+                setJobStatus(data.video_id, null);
+                if (data.kind === 'process') showThumbnail(data.video_id);
+            });
+            on('job_failed', data => setJobStatus(data.video_id, '⚠️ Falhou'));
+            on('reset', () => location.reload());
+        }
+        
         function deleteVideo(videoId) {
             if (confirm('Tem certeza que deseja mover este vídeo para a lixeira?')) {
                 fetch(`/videos/${videoId}/delete`, {
@@ -647,7 +1281,9 @@ HTML_TEMPLATE = """
                 .then(data => {
                     if (data.success) {
                         alert('Vídeo movido para a lixeira!');
-                        location.reload();
+                        // Estatísticas chegam pelo evento video_deleted
+                        const card = findCard(videoId);
+                        if (card) card.remove();
                     } else {
                         alert('Erro: ' + data.error);
                     }
@@ -662,34 +1298,36 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compilado uma única vez na importação, não a cada requisição
+DASHBOARD_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 @app.route('/', methods=['GET'])
 def index():
-    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_connection()
     cursor = conn.cursor()
     
-    # Buscar todos os vídeos ativos
-    cursor.execute('SELECT * FROM videos WHERE is_deleted = 0 ORDER BY created_at DESC')
-    videos = cursor.fetchall()
-    
-    # Calcular estatísticas
-    cursor.execute('SELECT COUNT(*) FROM videos WHERE is_deleted = 0')
-    total_videos = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(DISTINCT filter) FROM videos WHERE is_deleted = 0')
-    total_filters = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT SUM(size_bytes) FROM videos WHERE is_deleted = 0')
-    total_size = cursor.fetchone()[0] or 0
-    total_size_mb = round(total_size / 1024 / 1024, 1)
+    # Uma página de vídeos ativos, mais recentes primeiro
+    videos, next_cursor = list_videos_page(cursor, DASHBOARD_FIELDS, limit=DASHBOARD_PAGE_SIZE, after=after)
     
-    conn.close()
+    # Estatísticas lidas da tabela de resumo mantida por triggers
+    stats = library_stats(cursor)
+    total_size_mb = round(stats['total_bytes'] / 1024 / 1024, 1)
     
-    return render_template_string(HTML_TEMPLATE, 
-                                videos=videos,
-                                total_videos=total_videos,
-                                total_filters=total_filters,
-                                total_size_mb=total_size_mb)
+    return DASHBOARD_TEMPLATE.render(videos=videos,
+                                     next_cursor=next_cursor,
+                                     paginated=after is not None,
+                                     total_videos=stats['total_videos'],
+                                     total_filters=stats['total_filters'],
+                                     total_size_mb=total_size_mb)
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção o app roda no gunicorn (gunicorn.conf.py)
+    reset_metrics_dir()
     init_database()
+    start_worker_pool()
     app.run(host='0.0.0.0', port=10001, debug=False)
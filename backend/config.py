@@ -0,0 +1,80 @@
+import os
+
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", "media")
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "data/videos.db")
+
+# Pool de processos que consome a fila de jobs (padrão: um por núcleo)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 1))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+JOB_PROGRESS_INTERVAL = float(os.environ.get("JOB_PROGRESS_INTERVAL", "0.5"))
+
+# Encoder H.264 usado na saída processada (compatível com navegadores)
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.environ.get("FFPROBE_BIN", "ffprobe")
+FFMPEG_PRESET = os.environ.get("FFMPEG_PRESET", "veryfast")
+FFMPEG_CRF = int(os.environ.get("FFMPEG_CRF", "23"))
+# Usa filtergraphs nativos do ffmpeg quando o filtro tiver equivalente
+FFMPEG_NATIVE_FILTERS = os.environ.get("FFMPEG_NATIVE_FILTERS", "true").lower() in ("1", "true", "yes")
+
+# Vídeos longos são divididos em segmentos filtrados em paralelo (no máximo SEGMENT_COUNT, padrão um por
+# núcleo). Ao pegar o job, o worker reduz o pool aos núcleos que os outros jobs em andamento deixam livres
+SEGMENT_COUNT = int(os.environ.get("SEGMENT_COUNT", os.cpu_count() or 1))
+SEGMENT_MIN_DURATION = float(os.environ.get("SEGMENT_MIN_DURATION", "300"))
+
+# Tamanho máximo de um upload (padrão 10 GiB); 0 desativa o limite
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(10 * 1024 ** 3)))
+
+# Uploads retomáveis: sessões sem atividade por mais que isto (segundos) são descartadas com o arquivo
+# pré-alocado; máximo de sessões abertas ao mesmo tempo (0 desativa o limite)
+UPLOAD_SESSION_TTL = float(os.environ.get("UPLOAD_SESSION_TTL", str(24 * 3600)))
+UPLOAD_MAX_OPEN_SESSIONS = int(os.environ.get("UPLOAD_MAX_OPEN_SESSIONS", "100"))
+
+# Saída HLS opcional: duração dos segmentos e alturas extras da escada (ex.: "720,480")
+HLS_SEGMENT_SECONDS = int(os.environ.get("HLS_SEGMENT_SECONDS", "4"))
+HLS_LADDER = [int(h) for h in os.environ.get("HLS_LADDER", "").split(",") if h.strip()]
+
+# SQLite: cache de páginas (KiB), mmap e espera por locks (segundos)
+SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB", "16384"))
+SQLITE_MMAP_BYTES = int(os.environ.get("SQLITE_MMAP_BYTES", str(256 * 1024 ** 2)))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30"))
+
+# /readyz responde 503 quando a fila passa deste número de jobs aguardando
+READY_MAX_QUEUED_JOBS = int(os.environ.get("READY_MAX_QUEUED_JOBS", "100"))
+
+# Thumbnails: lado maior (px) e quantos frames candidatos a passada principal avalia
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "150"))
+THUMBNAIL_CANDIDATES = int(os.environ.get("THUMBNAIL_CANDIDATES", "12"))
+
+# Sprite de pré-visualização para hover: quadros para uploads que não informam sprite_frames (0: sem sprite,
+# o padrão; cada upload pode pedir o seu), colunas e largura de cada quadro
+SPRITE_FRAMES = int(os.environ.get("SPRITE_FRAMES", "0"))
+SPRITE_COLUMNS = int(os.environ.get("SPRITE_COLUMNS", "5"))
+SPRITE_TILE_WIDTH = int(os.environ.get("SPRITE_TILE_WIDTH", "160"))
+
+# Cache em disco das thumbnails redimensionadas (?w=&h=&fmt=), limitado pelo total de bytes (LRU)
+THUMBNAIL_CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", os.path.join(MEDIA_ROOT, "cache", "thumbnails"))
+THUMBNAIL_CACHE_BYTES = int(os.environ.get("THUMBNAIL_CACHE_BYTES", str(256 * 1024 ** 2)))
+THUMBNAIL_CACHE_TOUCH_INTERVAL = float(os.environ.get("THUMBNAIL_CACHE_TOUCH_INTERVAL", "60"))
+
+# /events (SSE): intervalo de leitura do log, heartbeat, duração de cada conexão e eventos mantidos no banco
+EVENTS_POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL", "0.5"))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_STREAM_SECONDS = float(os.environ.get("EVENTS_STREAM_SECONDS", "300"))
+EVENTS_RETENTION = int(os.environ.get("EVENTS_RETENTION", "10000"))
+# Conexões /events simultâneas por processo web (além disso, 503); cada uma prende uma thread enquanto dura
+EVENTS_MAX_CLIENTS = int(os.environ.get("EVENTS_MAX_CLIENTS", "16"))
+
+# Servidor de produção (gunicorn, ver gunicorn.conf.py): endereço, processos web, threads por processo
+# e espera pelas requisições em andamento no reload. As threads são as EVENTS_MAX_CLIENTS que as conexões
+# /events podem prender mais WEB_REQUEST_THREADS para a API e os downloads, que nunca ficam sem thread
+SERVER_BIND = os.environ.get("SERVER_BIND", "0.0.0.0:10001")
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))
+WEB_REQUEST_THREADS = int(os.environ.get("WEB_REQUEST_THREADS", "16"))
+WEB_THREADS = EVENTS_MAX_CLIENTS + WEB_REQUEST_THREADS
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+WEB_KEEPALIVE = int(os.environ.get("WEB_KEEPALIVE", "5"))
+
+# Entrega de mídia por um proxy reverso: "" (o próprio servidor, com sendfile), "x-accel" (nginx) ou "x-sendfile"
+# (Apache/lighttpd); no x-accel, MEDIA_ACCEL_PREFIX é a location interna do nginx que aponta para MEDIA_ROOT
+MEDIA_OFFLOAD = os.environ.get("MEDIA_OFFLOAD", "").lower()
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/internal-media/")
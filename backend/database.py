@@ -0,0 +1,65 @@
+import os
+import time
+import sqlite3
+import threading
+
+from config import DATABASE_PATH, SQLITE_CACHE_KB, SQLITE_MMAP_BYTES, SQLITE_BUSY_TIMEOUT
+from metrics import observe_query
+
+# Uma conexão por thread (e por processo), reaproveitada entre requisições
+_local = threading.local()
+
+def _reset_connections():
+    # Conexões SQLite não podem atravessar fork: cada processo filho abre as suas
+    global _local
+    _local = threading.local()
+
+os.register_at_fork(after_in_child=_reset_connections)
+
+class TimedCursor(sqlite3.Cursor):
+    # Latência de cada execute vai para o histograma sqlite_query_seconds
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observe_query(sql, started)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+def _open_connection(autocommit):
+    conn = sqlite3.connect(DATABASE_PATH, timeout=SQLITE_BUSY_TIMEOUT, factory=TimedConnection,
+                           isolation_level=None if autocommit else '')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_BYTES}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_connection(autocommit=False):
+    # autocommit=True: transações explícitas (BEGIN IMMEDIATE), usado pela fila de jobs
+    key = 'autocommit' if autocommit else 'default'
+    conn = getattr(_local, key, None)
+    if conn is None:
+        conn = _open_connection(autocommit)
+        setattr(_local, key, conn)
+    return conn
+
+def release_connection():
+    # Chamado ao fim de cada requisição: nunca deixa transação aberta na conexão reaproveitada
+    conn = getattr(_local, 'default', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+def enable_wal(conn):
+    # WAL é persistente no arquivo: leitores não bloqueiam escritores
+    conn.execute('PRAGMA journal_mode = WAL')
+
+def id_prefix_range(prefix):
+    # "id LIKE 'abc%'" não usa o índice da chave primária; o intervalo [abc, abd) usa
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
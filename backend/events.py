@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import queue
+import threading
+from datetime import datetime
+
+from config import EVENTS_RETENTION, EVENTS_POLL_INTERVAL, EVENTS_MAX_CLIENTS
+from database import get_connection
+
+# Mudanças publicadas em /events; cada uma leva o id do vídeo e um payload JSON
+EVENT_VIDEO_ADDED = 'video_added'
+EVENT_VIDEO_DELETED = 'video_deleted'
+EVENT_JOB_PROGRESS = 'job_progress'
+EVENT_JOB_DONE = 'job_done'
+EVENT_JOB_FAILED = 'job_failed'
+# Enviado quando o cliente pede eventos já removidos do log: precisa recarregar tudo
+EVENT_RESET = 'reset'
+
+EVENTS_BATCH = 100
+EVENTS_PRUNE_EVERY = 500
+# Eventos pendentes por conexão; um cliente que fica para trás disso é desconectado e retoma pelo Last-Event-ID
+EVENTS_CLIENT_QUEUE = 1000
+
+def init_events_table(cursor):
+    # Log de mudanças compartilhado entre o servidor e os workers; seq é o Last-Event-ID do SSE
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT,
+            video_id TEXT,
+            data TEXT,
+            created_at TEXT
+        )
+    ''')
+
+def publish_event(db, event_type, video_id, **data):
+    # db: cursor ou conexão; o evento entra na mesma transação da mudança que ele descreve
+    data['video_id'] = video_id
+    seq = db.execute('INSERT INTO events (type, video_id, data, created_at) VALUES (?, ?, ?, ?)',
+                     (event_type, video_id, json.dumps(data), datetime.now().isoformat())).lastrowid
+    if seq % EVENTS_PRUNE_EVERY == 0:
+        db.execute('DELETE FROM events WHERE seq <= ?', (seq - EVENTS_RETENTION,))
+    return seq
+
+def event_bounds(cursor):
+    cursor.execute('SELECT COALESCE(MIN(seq), 0), COALESCE(MAX(seq), 0) FROM events')
+    return cursor.fetchone()
+
+def events_since(cursor, seq, limit=EVENTS_BATCH):
+    cursor.execute('SELECT seq, type, data FROM events WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit))
+    return cursor.fetchall()
+
+def format_event(seq, event_type, data):
+    return f"id: {seq}\nevent: {event_type}\ndata: {data}\n\n"
+
+class EventSubscriber:
+    def __init__(self, start_seq):
+        # Eventos com seq > start_seq chegam pela fila; os anteriores o cliente lê do banco
+        self.start_seq = start_seq
+        self.queue = queue.Queue(EVENTS_CLIENT_QUEUE)
+        self.overflowed = False
+
+class EventBroadcaster:
+    # Um único leitor do log por processo, em vez de uma consulta por conexão /events a cada intervalo:
+    # a thread só existe enquanto há inscritos e distribui cada lote para a fila de todos eles
+    def __init__(self, max_clients=EVENTS_MAX_CLIENTS, poll_interval=EVENTS_POLL_INTERVAL):
+        self.max_clients = max_clients
+        self.poll_interval = poll_interval
+        self._reset()
+
+    def _reset(self):
+        # Também depois de fork: a thread leitora não existe no processo filho
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.seq = 0
+
+    def subscribe(self):
+        # None quando o processo já atende max_clients conexões
+        with self.lock:
+            if self.max_clients and len(self.subscribers) >= self.max_clients:
+                return None
+            if self.thread is None:
+                self.seq = event_bounds(get_connection().cursor())[1]
+                self.thread = threading.Thread(target=self._poll, name='events-broadcaster', daemon=True)
+                self.thread.start()
+            subscriber = EventSubscriber(self.seq)
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def _poll(self):
+        cursor = get_connection().cursor()
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+                seq = self.seq
+            rows = events_since(cursor, seq)
+            with self.lock:
+                for subscriber in self.subscribers:
+                    for row in rows:
+                        try:
+                            subscriber.queue.put_nowait(row)
+                        except queue.Full:
+                            subscriber.overflowed = True
+                            break
+                if rows:
+                    self.seq = rows[-1][0]
+            if len(rows) < EVENTS_BATCH:
+                time.sleep(self.poll_interval)
+
+EVENT_BROADCASTER = EventBroadcaster()
+os.register_at_fork(after_in_child=EVENT_BROADCASTER._reset)
@@ -0,0 +1,200 @@
+import re
+import cv2
+import numpy as np
+
+# Registro de filtros: cada filtro declara seus parâmetros e suas implementações
+# (filtergraph do ffmpeg e estágio OpenCV). Uma cadeia como "blur(sigma=3)|edge"
+# roda inteira numa única passada de decode/encode.
+FILTER_REGISTRY = {}
+
+CHAIN_SEPARATOR = '|'
+STAGE_PATTERN = re.compile(r'^\s*([a-z_][a-z0-9_]*)\s*(?:\((.*)\))?\s*$')
+
+class Param:
+    def __init__(self, default, minimum, maximum):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def parse(self, name, value):
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+        if not self.minimum <= number <= self.maximum:
+            raise ValueError(f"{name} must be between {self.minimum:g} and {self.maximum:g}")
+        return number
+
+class Filter:
+    name = None
+    params = {}
+
+    def ffmpeg(self, params):
+        # Filtergraph equivalente, ou None para usar só o estágio OpenCV
+        return None
+
+    def opencv(self, params, height, width):
+        # Devolve uma função frame -> frame que escreve em buffers alocados aqui, uma vez por job
+        raise NotImplementedError
+
+def register_filter(filter_class):
+    instance = filter_class()
+    FILTER_REGISTRY[instance.name] = instance
+    return filter_class
+
+def parse_chain(spec):
+    # "blur(sigma=3)|edge" -> [(filtro, {'sigma': 3.0}), (filtro, {'low': 100.0, 'high': 200.0})]
+    if not spec or not spec.strip():
+        raise ValueError("Empty filter")
+    chain = []
+    for stage in spec.split(CHAIN_SEPARATOR):
+        match = STAGE_PATTERN.match(stage)
+        if not match:
+            raise ValueError(f"Invalid filter stage: {stage.strip()}")
+        name, arguments = match.group(1), match.group(2)
+        if name not in FILTER_REGISTRY:
+            raise ValueError(f"Unknown filter: {name}")
+        filter_ = FILTER_REGISTRY[name]
+        params = {key: param.default for key, param in filter_.params.items()}
+        for argument in (arguments or '').split(','):
+            if not argument.strip():
+                continue
+            key, separator, value = argument.partition('=')
+            key = key.strip()
+            if not separator or key not in filter_.params:
+                raise ValueError(f"Invalid parameter for {name}: {argument.strip()}")
+            params[key] = filter_.params[key].parse(key, value.strip())
+        chain.append((filter_, params))
+    return chain
+
+def format_chain(chain):
+    # Forma canônica: parâmetros na ordem declarada, omitindo os valores padrão
+    stages = []
+    for filter_, params in chain:
+        arguments = [f"{key}={params[key]:g}" for key, param in filter_.params.items()
+                     if params[key] != param.default]
+        stages.append(f"{filter_.name}({','.join(arguments)})" if arguments else filter_.name)
+    return CHAIN_SEPARATOR.join(stages)
+
+def normalize_chain(spec):
+    return format_chain(parse_chain(spec))
+
+def chain_slug(chain):
+    # Nome de diretório: "blur(sigma=3)|edge" -> "blur-sigma-3_edge"
+    return '_'.join(re.sub(r'[^a-z0-9.-]+', '-', stage.replace('(', '-').rstrip(')'))
+                    for stage in format_chain(chain).split(CHAIN_SEPARATOR))
+
+def chain_label(spec):
+    # Rótulo de métricas: só nomes registrados, sem parâmetros nem repetições ("blur(sigma=3.7)|edge" -> "blur|edge")
+    return CHAIN_SEPARATOR.join(dict.fromkeys(filter_.name for filter_, _ in parse_chain(spec)))
+
+def native_filtergraph(chain):
+    graphs = [filter_.ffmpeg(params) for filter_, params in chain]
+    if any(graph is None for graph in graphs):
+        return None
+    return ','.join(graphs)
+
+class FrameFilter:
+    # Estágios OpenCV da cadeia, cada um com seus próprios buffers de saída reutilizados a cada frame
+    def __init__(self, chain, height, width):
+        self.stages = [filter_.opencv(params, height, width) for filter_, params in chain]
+
+    def __call__(self, frame):
+        for stage in self.stages:
+            frame = stage(frame)
+        return frame
+
+@register_filter
+class Grayscale(Filter):
+    name = 'grayscale'
+
+    def ffmpeg(self, params):
+        return 'format=gray'
+
+    def opencv(self, params, height, width):
+        gray = np.empty((height, width), dtype=np.uint8)
+        output = np.empty((height, width, 3), dtype=np.uint8)
+
+        def apply(frame):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=output)
+        return apply
+
+@register_filter
+class Blur(Filter):
+    name = 'blur'
+    # sigma 2.6 é o que o OpenCV deriva de um kernel 15x15
+    params = {'sigma': Param(2.6, 0.1, 50)}
+
+    def ffmpeg(self, params):
+        # Em gbrp para borrar os três canais na resolução cheia, como o OpenCV
+        return f"format=gbrp,gblur=sigma={params['sigma']:g}:steps=3"
+
+    def opencv(self, params, height, width):
+        sigma = params['sigma']
+        # Inverso da fórmula do OpenCV (sigma = 0.3 * ((k - 1) * 0.5 - 1) + 0.8): 2.6 -> 15
+        ksize = max(3, int(round(((sigma - 0.8) / 0.3 + 1) * 2 + 1)) | 1)
+        output = np.empty((height, width, 3), dtype=np.uint8)
+
+        def apply(frame):
+            return cv2.GaussianBlur(frame, (ksize, ksize), sigma, dst=output)
+        return apply
+
+@register_filter
+class Edge(Filter):
+    name = 'edge'
+    params = {'low': Param(100, 0, 255), 'high': Param(200, 0, 255)}
+
+    def ffmpeg(self, params):
+        return f"format=gray,edgedetect=low={params['low'] / 255:.3f}:high={params['high'] / 255:.3f}"
+
+    def opencv(self, params, height, width):
+        low, high = params['low'], params['high']
+        gray = np.empty((height, width), dtype=np.uint8)
+        edges = np.empty((height, width), dtype=np.uint8)
+        output = np.empty((height, width, 3), dtype=np.uint8)
+
+        def apply(frame):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            cv2.Canny(gray, low, high, edges=edges)
+            return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR, dst=output)
+        return apply
+
+@register_filter
+class Brightness(Filter):
+    name = 'brightness'
+    params = {'amount': Param(50, -255, 255)}
+
+    def ffmpeg(self, params):
+        # +amount em cada canal BGR ~ amount * 219 / 255 na luma em faixa limitada
+        return f"eq=brightness={params['amount'] * 219 / 255 / 255:.3f}"
+
+    def opencv(self, params, height, width):
+        amount = params['amount']
+        offset = (amount, amount, amount, 0)
+        output = np.empty((height, width, 3), dtype=np.uint8)
+
+        def apply(frame):
+            # Soma com saturação inteira, o mesmo que convertScaleAbs(alpha=1.0, beta=amount) para amount >= 0
+            return cv2.add(frame, offset, dst=output)
+        return apply
+
+# Matriz sepia sobre BGR; em uint8 o cv2.transform já usa ponto fixo inteiro e satura
+SEPIA_KERNEL = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]])
+
+@register_filter
+class Sepia(Filter):
+    name = 'sepia'
+
+    def ffmpeg(self, params):
+        # Mesma matriz do cv2.transform aplicada sobre BGR
+        return 'colorchannelmixer=rr=0.189:rg=0.769:rb=0.393:gr=0.168:gg=0.686:gb=0.349:br=0.131:bg=0.534:bb=0.272'
+
+    def opencv(self, params, height, width):
+        output = np.empty((height, width, 3), dtype=np.uint8)
+
+        def apply(frame):
+            return cv2.transform(frame, SEPIA_KERNEL, dst=output)
+        return apply
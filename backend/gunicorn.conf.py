@@ -0,0 +1,39 @@
+import os
+import runpy
+import subprocess
+import sys
+
+# Lido sem import: o master não guarda módulos do app em sys.modules, então os workers recriados por
+# `kill -HUP` importam o código atual em vez de herdar o do master por fork
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+settings = runpy.run_path(os.path.join(BACKEND_DIR, "config.py"))
+
+# Servidor de produção: `gunicorn` na pasta backend lê este arquivo. `kill -HUP` no master recria os
+# workers web sem derrubar conexões: os antigos terminam as requisições em andamento (até WEB_GRACEFUL_TIMEOUT).
+# O pool de jobs (when_ready) não é recriado pelo HUP: continua com o código de quando subiu até o restart
+wsgi_app = "app:app"
+bind = settings["SERVER_BIND"]
+worker_class = "gthread"
+workers = settings["WEB_WORKERS"]
+threads = settings["WEB_THREADS"]
+graceful_timeout = settings["WEB_GRACEFUL_TIMEOUT"]
+keepalive = settings["WEB_KEEPALIVE"]
+# Corpo de send_file vai por sendfile(2): o kernel copia do arquivo para o socket, sem passar pelo Python
+sendfile = True
+accesslog = "-"
+
+def on_starting(server):
+    # Antes de qualquer worker, num processo à parte: métricas de execuções anteriores descartadas e
+    # tabelas criadas/migradas
+    subprocess.run([sys.executable, "-c", "import metrics, app; metrics.reset_metrics_dir(); app.init_database()"],
+                   check=True)
+
+def when_ready(server):
+    # Fila de jobs num processo à parte: forks do master herdariam os handlers de sinal do gunicorn
+    server.job_pool = subprocess.Popen([sys.executable, "-m", "jobs"])
+
+def on_exit(server):
+    job_pool = getattr(server, "job_pool", None)
+    if job_pool:
+        job_pool.terminate()
+        job_pool.wait()
@@ -0,0 +1,175 @@
+import os
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from config import MEDIA_ROOT, MAX_UPLOAD_BYTES
+
+INGEST_CHUNK_SIZE = 1024 * 1024
+
+class ContentHasher:
+    # MD5 mantido por compatibilidade (meta.json); BLAKE2b é a chave de deduplicação
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.blake2b = hashlib.blake2b(digest_size=32)
+        self.size = 0
+
+    def update(self, data):
+        self.md5.update(data)
+        self.blake2b.update(data)
+        self.size += len(data)
+
+    def digests(self):
+        return {
+            'checksum': self.md5.hexdigest(),
+            'blake2b': self.blake2b.hexdigest(),
+            'size_bytes': self.size,
+        }
+
+def hash_file(path):
+    hasher = ContentHasher()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(INGEST_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.digests()
+
+class IngestFile:
+    # Grava o upload direto em media/incoming calculando hashes e tamanho na mesma passada
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hasher = ContentHasher()
+        self._file = open(path, 'w+b')
+
+    def write(self, data):
+        if self.max_bytes and self.hasher.size + len(data) > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge()
+        self.hasher.update(data)
+        return self._file.write(data)
+
+    def digests(self):
+        return self.hasher.digests()
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # seek/read/close etc. vão para o arquivo em disco
+        return getattr(self._file, name)
+
+class IngestRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        incoming_dir = os.path.join(MEDIA_ROOT, "incoming")
+        os.makedirs(incoming_dir, exist_ok=True)
+        stream = IngestFile(os.path.join(incoming_dir, f"{uuid.uuid4()}.part"), MAX_UPLOAD_BYTES)
+        self.ingest_files = getattr(self, 'ingest_files', []) + [stream]
+        return stream
+
+def cleanup_ingest_files(request):
+    # Remove arquivos parciais de uploads abortados ou não usados pela rota
+    for stream in getattr(request, 'ingest_files', []):
+        stream.discard()
+
+# Uploads retomáveis: sessão -> PUT de blocos com offset -> finalize
+UPLOAD_OPEN = 'open'
+# Reservada por um finalize em andamento: o vídeo é registrado antes de a sessão ser encerrada
+UPLOAD_FINALIZING = 'finalizing'
+# Guarda vídeo e job até expirar, para responder a um finalize repetido
+UPLOAD_FINALIZED = 'finalized'
+
+def init_upload_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            original_name TEXT,
+            original_ext TEXT,
+            filter TEXT,
+            mode TEXT,
+            size_bytes INTEGER,
+            path TEXT,
+            status TEXT,
+            created_at TEXT,
+            hls INTEGER DEFAULT 0,
+            updated_at TEXT,
+            sprite_frames INTEGER DEFAULT 0,
+            video_id TEXT,
+            job_id TEXT
+        )
+    ''')
+    cursor.execute("PRAGMA table_info(upload_sessions)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'hls' not in columns:
+        cursor.execute('ALTER TABLE upload_sessions ADD COLUMN hls INTEGER DEFAULT 0')
+    if 'updated_at' not in columns:
+        cursor.execute('ALTER TABLE upload_sessions ADD COLUMN updated_at TEXT')
+        cursor.execute('UPDATE upload_sessions SET updated_at = created_at')
+    if 'sprite_frames' not in columns:
+        cursor.execute('ALTER TABLE upload_sessions ADD COLUMN sprite_frames INTEGER DEFAULT 0')
+    if 'video_id' not in columns:
+        cursor.execute('ALTER TABLE upload_sessions ADD COLUMN video_id TEXT')
+    if 'job_id' not in columns:
+        cursor.execute('ALTER TABLE upload_sessions ADD COLUMN job_id TEXT')
+    # Varredura das sessões expiradas por última atividade
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_sessions_updated ON upload_sessions (updated_at)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_chunks (
+            upload_id TEXT,
+            offset INTEGER,
+            length INTEGER,
+            PRIMARY KEY (upload_id, offset)
+        )
+    ''')
+
+def create_upload_file(upload_id, size_bytes):
+    incoming_dir = os.path.join(MEDIA_ROOT, "incoming")
+    os.makedirs(incoming_dir, exist_ok=True)
+    path = os.path.join(incoming_dir, f"{upload_id}.upload")
+    with open(path, 'wb') as f:
+        f.truncate(size_bytes)
+    return path
+
+def expire_upload_sessions(cursor, ttl):
+    # Remove sessões sem atividade há mais de ttl segundos, com blocos e arquivo pré-alocado
+    cutoff = (datetime.now() - timedelta(seconds=ttl)).isoformat()
+    cursor.execute('SELECT id, path, status FROM upload_sessions WHERE updated_at < ?', (cutoff,))
+    expired = cursor.fetchall()
+    for upload_id, path, status in expired:
+        # Finalizadas já tiveram o arquivo movido para o vídeo
+        if status != UPLOAD_FINALIZED and path and os.path.exists(path):
+            os.remove(path)
+        cursor.execute('DELETE FROM upload_chunks WHERE upload_id = ?', (upload_id,))
+        cursor.execute('DELETE FROM upload_sessions WHERE id = ?', (upload_id,))
+    return len(expired)
+
+def count_open_upload_sessions(cursor):
+    cursor.execute('SELECT COUNT(*) FROM upload_sessions WHERE status != ?', (UPLOAD_FINALIZED,))
+    return cursor.fetchone()[0]
+
+def write_chunk(path, offset, stream, length):
+    # Copia o corpo da requisição em blocos para a posição indicada do arquivo
+    written = 0
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(INGEST_CHUNK_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+    return written
+
+def received_ranges(chunks):
+    # Une os intervalos (offset, length) recebidos em faixas contíguas
+    ranges = []
+    for offset, length in sorted(chunks):
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], offset + length)
+        else:
+            ranges.append([offset, offset + length])
+    return ranges
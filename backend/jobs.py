@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import signal
+import atexit
+import uuid
+import json
+import sqlite3
+import multiprocessing
+from datetime import datetime
+
+from config import JOB_WORKERS, JOB_POLL_INTERVAL, JOB_PROGRESS_INTERVAL, HLS_SEGMENT_SECONDS
+from processing import (apply_filter, apply_filters, apply_filter_segmented, choose_thumbnail, generate_thumbnails,
+                        generate_sprite, generate_hls, keyframe_expression, fit_segment_count, link_or_copy)
+from ingest import hash_file
+from database import get_connection
+from metrics import stage_timer, FrameCounter
+from events import publish_event, EVENT_JOB_PROGRESS, EVENT_JOB_DONE, EVENT_JOB_FAILED
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Tipos de job: processamento do upload ou versões extras de um vídeo existente
+JOB_PROCESS = 'process'
+JOB_RENDITIONS = 'renditions'
+
+JOB_COLUMNS = ('id', 'video_id', 'status', 'params', 'frames_done', 'frames_total',
+               'error', 'created_at', 'started_at', 'finished_at', 'kind')
+
+def init_jobs_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            video_id TEXT,
+            status TEXT,
+            params TEXT,
+            frames_done INTEGER DEFAULT 0,
+            frames_total INTEGER DEFAULT 0,
+            error TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT,
+            kind TEXT DEFAULT 'process'
+        )
+    ''')
+    cursor.execute("PRAGMA table_info(jobs)")
+    if 'kind' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN kind TEXT DEFAULT 'process'")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)')
+
+def init_renditions_table(cursor):
+    # Versões extras de um vídeo (um filtro ou cadeia cada), geradas a partir do mesmo original
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS renditions (
+            video_id TEXT,
+            filter TEXT,
+            slug TEXT,
+            path TEXT,
+            status TEXT,
+            job_id TEXT,
+            created_at TEXT,
+            finished_at TEXT,
+            PRIMARY KEY (video_id, filter)
+        )
+    ''')
+
+def enqueue_job(cursor, video_id, params, kind=JOB_PROCESS):
+    job_id = str(uuid.uuid4())
+    cursor.execute('''
+        INSERT INTO jobs (id, video_id, status, params, created_at, kind)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (job_id, video_id, JOB_QUEUED, json.dumps(params), datetime.now().isoformat(), kind))
+    return job_id
+
+def job_to_dict(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job['params'] = json.loads(job['params'] or '{}')
+    total = job['frames_total'] or 0
+    job['progress'] = round(job['frames_done'] / total, 4) if total else None
+    return job
+
+def get_job(job_id):
+    cursor = get_connection().cursor()
+    cursor.execute(f'SELECT {", ".join(JOB_COLUMNS)} FROM jobs WHERE id = ?', (job_id,))
+    row = cursor.fetchone()
+    return job_to_dict(row) if row else None
+
+def count_queued_jobs(cursor):
+    # Conta só as entradas 'queued' de idx_jobs_status_created
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (JOB_QUEUED,))
+    return cursor.fetchone()[0]
+
+def count_other_running_jobs(cursor, job_id):
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE status = ? AND id != ?', (JOB_RUNNING, job_id))
+    return cursor.fetchone()[0]
+
+def count_jobs_by_status():
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT status, COUNT(*) FROM jobs WHERE status IN (?, ?) GROUP BY status',
+                   (JOB_QUEUED, JOB_RUNNING))
+    counts = {JOB_QUEUED: 0, JOB_RUNNING: 0}
+    counts.update(cursor.fetchall())
+    return list(counts.items())
+
+def claim_next_job(conn):
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute(f'''
+            SELECT {", ".join(JOB_COLUMNS)} FROM jobs
+            WHERE status = ? ORDER BY created_at LIMIT 1
+        ''', (JOB_QUEUED,))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute('UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                           (JOB_RUNNING, datetime.now().isoformat(), row[0]))
+        cursor.execute('COMMIT')
+    except Exception:
+        # BEGIN pode ter falhado (banco travado): nesse caso não há o que desfazer
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+    return job_to_dict(row) if row else None
+
+def requeue_interrupted_jobs():
+    # Jobs que estavam rodando quando o servidor caiu voltam para a fila
+    get_connection(autocommit=True).execute('UPDATE jobs SET status = ?, frames_done = 0 WHERE status = ?',
+                                            (JOB_QUEUED, JOB_RUNNING))
+
+def _progress_reporter(conn, job, frame_counter):
+    last_report = [0.0]
+
+    def report(frames_done, frames_total):
+        # Grava no banco no máximo a cada JOB_PROGRESS_INTERVAL segundos
+        frame_counter.update(frames_done)
+        now = time.monotonic()
+        if now - last_report[0] < JOB_PROGRESS_INTERVAL and frames_done != frames_total:
+            return
+        last_report[0] = now
+        frame_counter.publish()
+        try:
+            conn.execute('UPDATE jobs SET frames_done = ?, frames_total = ? WHERE id = ?',
+                         (frames_done, frames_total, job['id']))
+            publish_event(conn, EVENT_JOB_PROGRESS, job['video_id'], job_id=job['id'],
+                          kind=job['kind'] or JOB_PROCESS, frames_done=frames_done, frames_total=frames_total)
+        except sqlite3.Error as e:
+            # Banco travado: perde-se só esta atualização de andamento, não o job
+            print(f"Erro ao gravar o andamento do job {job['id']}: {e}")
+
+    return report
+
+def find_processed(conn, blake2b, filter_type, video_id):
+    # Saída já gerada para o mesmo conteúdo e filtro: principal de outro upload ou rendição pronta.
+    # Devolve (caminho, diretório de thumbs); thumbs só valem para a saída principal do outro upload
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT path_processed, path_original FROM videos
+        WHERE checksum_blake2b = ? AND filter = ? AND is_deleted = 0 AND id != ?
+        UNION ALL
+        SELECT r.path, NULL FROM videos v JOIN renditions r ON r.video_id = v.id
+        WHERE v.checksum_blake2b = ? AND r.filter = ? AND r.status = ? AND v.is_deleted = 0 AND v.id != ?
+    ''', (blake2b, filter_type, video_id, blake2b, filter_type, JOB_DONE, video_id))
+    for path, original_path in cursor.fetchall():
+        if not os.path.exists(path):
+            continue
+        if original_path:
+            return path, os.path.join(os.path.dirname(os.path.dirname(original_path)), "thumbs")
+        return path, None
+    return None, None
+
+def link_thumbnails(source_dir, thumbs_dir):
+    # Thumbs e sprite de um upload com o mesmo conteúdo e filtro
+    linked = False
+    for name in ("original.jpg", "processed.jpg", "sprite.jpg", "sprite.json"):
+        source_path = os.path.join(source_dir, name)
+        if os.path.exists(source_path):
+            link_or_copy(source_path, os.path.join(thumbs_dir, name))
+            linked = linked or name == "processed.jpg"
+    return linked
+
+def store_digests(conn, video_id, original_path, digests):
+    conn.execute('UPDATE videos SET checksum = ?, checksum_blake2b = ? WHERE id = ?',
+                 (digests['checksum'], digests['blake2b'], video_id))
+    # Mesmo conteúdo já armazenado: o original vira um link para ele, como no upload direto
+    rows = conn.execute('SELECT path_original FROM videos WHERE checksum_blake2b = ? AND is_deleted = 0 AND id != ?',
+                        (digests['blake2b'], video_id)).fetchall()
+    existing = next((row[0] for row in rows if os.path.exists(row[0])), None)
+    if existing and not os.path.samefile(existing, original_path):
+        link_path = f"{original_path}.link"
+        link_or_copy(existing, link_path)
+        os.replace(link_path, original_path)
+
+def process_job(conn, job):
+    params = job['params']
+    original_path = params['original_path']
+    processed_path = params['processed_path']
+    base_path = params['base_path']
+    filter_type = params['filter']
+    if not params.get('blake2b'):
+        # Uploads retomáveis (e jobs enfileirados antes do hash na recepção): o hash sai aqui, não na
+        # thread da requisição
+        with stage_timer('hash', filter_type):
+            params.update(hash_file(original_path))
+        store_digests(conn, job['video_id'], original_path, params)
+
+    os.makedirs(os.path.dirname(processed_path), exist_ok=True)
+    # Candidatos a thumbnail são gravados pela própria passada de filtro
+    thumbs_dir = os.path.join(base_path, "thumbs")
+    candidates_dir = os.path.join(thumbs_dir, "candidates")
+    os.makedirs(candidates_dir, exist_ok=True)
+    thumbnails = os.path.join(candidates_dir, "frame")
+    frame_counter = FrameCounter(filter_type)
+    progress_callback = _progress_reporter(conn, job, frame_counter)
+    existing_processed, existing_thumbs = find_processed(conn, params['blake2b'], filter_type, job['video_id'])
+    thumbs_ready = False
+    # Com HLS, o encode principal já sai com keyframes nos cortes dos segmentos: a rendição 0 é só remux
+    keyframe_interval = HLS_SEGMENT_SECONDS if params.get('hls') else None
+    # O número de segmentos pedido no upload vale só se houver núcleos livres agora
+    segments = fit_segment_count(params.get('segments', 1), count_other_running_jobs(conn.cursor(), job['id']))
+    if existing_processed:
+        # Mesmo conteúdo com o mesmo filtro já foi processado: só reaproveita
+        with stage_timer('dedup_link', filter_type):
+            link_or_copy(existing_processed, processed_path)
+            thumbs_ready = existing_thumbs is not None and link_thumbnails(existing_thumbs, thumbs_dir)
+    elif segments > 1:
+        with stage_timer('filter_segmented', filter_type):
+            apply_filter_segmented(original_path, processed_path, filter_type, segments,
+                                   progress_callback=progress_callback, thumbnails=thumbnails,
+                                   keyframe_interval=keyframe_interval)
+    else:
+        with stage_timer('filter', filter_type):
+            apply_filter(original_path, processed_path, filter_type, progress_callback=progress_callback,
+                         thumbnails=thumbnails,
+                         keyframes=keyframe_interval and keyframe_expression(keyframe_interval))
+    frame_counter.publish()
+
+    if params.get('hls'):
+        with stage_timer('hls', filter_type):
+            # Saída reaproveitada pode ter sido codificada sem os keyframes alinhados
+            generate_hls(processed_path, os.path.join(os.path.dirname(processed_path), "hls"),
+                         keyframes_aligned=not existing_processed)
+
+    with stage_timer('thumbnails', filter_type):
+        if not choose_thumbnail(candidates_dir, thumbs_dir) and not thumbs_ready:
+            generate_thumbnails(original_path, processed_path, thumbs_dir)
+        # Sprite só para uploads que pediram (sprite_frames); jobs antigos não têm o campo
+        sprite_frames = params.get('sprite_frames', 0)
+        if sprite_frames and not os.path.exists(os.path.join(thumbs_dir, "sprite.json")):
+            generate_sprite(processed_path, thumbs_dir, frames=sprite_frames)
+
+    # Create metadata
+    metadata = {
+        'id': job['video_id'],
+        'original_name': params['original_name'],
+        'filter': params['filter'],
+        'created_at': params['created_at'],
+        'checksum': params['checksum'],
+        'blake2b': params['blake2b']
+    }
+
+    with open(os.path.join(base_path, "meta.json"), 'w') as f:
+        json.dump(metadata, f)
+
+def _set_renditions_status(conn, video_id, filters, status, finished_at=None):
+    conn.execute(f'''
+        UPDATE renditions SET status = ?, finished_at = ?
+        WHERE video_id = ? AND filter IN ({", ".join("?" * len(filters))})
+    ''', [status, finished_at, video_id] + filters)
+
+def process_renditions_job(conn, job):
+    params = job['params']
+    filters = [rendition['filter'] for rendition in params['renditions']]
+    _set_renditions_status(conn, job['video_id'], filters, JOB_RUNNING)
+    try:
+        pending = []
+        for rendition in params['renditions']:
+            os.makedirs(os.path.dirname(rendition['path']), exist_ok=True)
+            existing, _ = find_processed(conn, params['blake2b'], rendition['filter'], job['video_id'])
+            if existing:
+                with stage_timer('dedup_link', rendition['filter']):
+                    link_or_copy(existing, rendition['path'])
+            else:
+                pending.append((rendition['filter'], rendition['path']))
+
+        if pending:
+            # Um único decode do original alimenta todos os filtros pendentes: o tempo da passada fica sem
+            # rótulo de filtro e os frames contam para cada um
+            frame_counter = FrameCounter(*(filter_type for filter_type, _ in pending))
+            with stage_timer('renditions'):
+                apply_filters(params['original_path'], pending,
+                              progress_callback=_progress_reporter(conn, job, frame_counter))
+            frame_counter.publish()
+    except Exception:
+        _set_renditions_status(conn, job['video_id'], filters, JOB_FAILED, datetime.now().isoformat())
+        raise
+    _set_renditions_status(conn, job['video_id'], filters, JOB_DONE, datetime.now().isoformat())
+
+JOB_HANDLERS = {
+    JOB_PROCESS: process_job,
+    JOB_RENDITIONS: process_renditions_job,
+}
+
+# Segundos entre o SIGTERM e o SIGKILL no grupo de um worker
+WORKER_STOP_GRACE = 2.0
+
+def _stop_worker_group(signum, frame):
+    if os.getpid() != os.getpgrp():
+        # Processo do pool de segmentos (herdou o handler): só sai
+        os._exit(128 + signum)
+    # Worker: encerra ffmpeg e pool de segmentos do job em andamento e, por fim, o grupo inteiro.
+    # O job fica como running e volta para a fila em requeue_interrupted_jobs
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.killpg(0, signal.SIGTERM)
+    time.sleep(WORKER_STOP_GRACE)
+    os.killpg(0, signal.SIGKILL)
+
+def _worker_loop():
+    # Grupo de processos próprio: ffmpeg e o pool de segmentos herdam o grupo e morrem com o worker
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, _stop_worker_group)
+    # Autocommit: a reserva de jobs usa BEGIN IMMEDIATE explícito
+    conn = get_connection(autocommit=True)
+    while True:
+        try:
+            job = claim_next_job(conn)
+        except sqlite3.Error as e:
+            # Ex.: "database is locked" depois do busy timeout; o worker não pode morrer por isso
+            print(f"Erro ao buscar job: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        if not job:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            JOB_HANDLERS[job['kind'] or JOB_PROCESS](conn, job)
+            error = None
+        except Exception as e:
+            print(f"Erro ao processar job {job['id']}: {e}")
+            error = str(e)
+        _record_job_result(conn, job, error)
+
+def _record_job_result(conn, job, error):
+    # Tenta até conseguir: se o resultado não for gravado, o job fica como running até o próximo restart
+    kind = job['kind'] or JOB_PROCESS
+    while True:
+        try:
+            # Status e evento juntos: uma nova tentativa não publica o evento duas vezes
+            conn.execute('BEGIN IMMEDIATE')
+            if error is None:
+                conn.execute('''
+                    UPDATE jobs SET status = ?, finished_at = ?, frames_done = frames_total
+                    WHERE id = ?
+                ''', (JOB_DONE, datetime.now().isoformat(), job['id']))
+                publish_event(conn, EVENT_JOB_DONE, job['video_id'], job_id=job['id'], kind=kind)
+            else:
+                conn.execute('UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                             (JOB_FAILED, error, datetime.now().isoformat(), job['id']))
+                publish_event(conn, EVENT_JOB_FAILED, job['video_id'], job_id=job['id'], kind=kind, error=error)
+            conn.execute('COMMIT')
+            return
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"Erro ao gravar o resultado do job {job['id']}: {e}")
+            time.sleep(JOB_POLL_INTERVAL)
+
+def stop_worker_pool(workers):
+    # Já encerrando: outro SIGTERM (o sys.exit do __main__) interromperia os joins e deixaria workers para trás
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join()
+
+def start_worker_pool(num_workers=JOB_WORKERS):
+    requeue_interrupted_jobs()
+    workers = []
+    # Registrado antes dos forks: uma saída no meio da criação ainda encerra os que já subiram
+    atexit.register(stop_worker_pool, workers)
+    for i in range(max(1, num_workers)):
+        # Não-daemon: o modo segmentado abre seu próprio pool de processos
+        worker = multiprocessing.Process(target=_worker_loop, name=f"video-worker-{i}")
+        worker.start()
+        workers.append(worker)
+    return workers
+
+if __name__ == '__main__':
+    # Pool avulso, fora do processo web (usado pelo gunicorn); SIGTERM encerra os workers via atexit.
+    # O handler vem antes dos forks: um SIGTERM durante a subida não deixa workers órfãos
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    workers = start_worker_pool()
+    for worker in workers:
+        worker.join()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import time
+from functools import lru_cache
+
+from config import DATABASE_PATH
+from filters import chain_label
+
+# Workers da fila e pools de segmentos são processos separados: o prometheus_client grava os
+# valores em arquivos mmap neste diretório, agregados por /metrics
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "metrics"))
+
+from prometheus_client import (CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+
+STAGE_SECONDS = Histogram('video_stage_seconds', 'Tempo gasto em cada etapa do processamento',
+                          ['stage', 'filter'], buckets=STAGE_BUCKETS)
+FRAMES_PROCESSED = Counter('video_frames_processed_total', 'Frames filtrados e codificados', ['filter'])
+INGESTED_BYTES = Counter('video_ingested_bytes_total', 'Bytes recebidos em uploads', ['source'])
+SERVED_BYTES = Counter('video_served_bytes_total', 'Bytes de mídia enviados', ['kind'])
+SQLITE_QUERY_SECONDS = Histogram('sqlite_query_seconds', 'Latência das consultas SQLite', ['operation'],
+                                 buckets=QUERY_BUCKETS)
+
+os.makedirs(METRICS_DIR, exist_ok=True)
+
+def reset_metrics_dir():
+    # Chamado uma vez na subida do servidor, antes de criar os workers: descarta arquivos de execuções anteriores
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+@lru_cache(maxsize=1024)
+def filter_label(filter_type):
+    # A cadeia vem do cliente: parâmetros e repetições não podem criar séries novas sem limite
+    if not filter_type:
+        return ''
+    try:
+        return chain_label(filter_type)
+    except ValueError:
+        return 'invalid'
+
+def stage_timer(stage, filter_type=''):
+    return STAGE_SECONDS.labels(stage, filter_label(filter_type)).time()
+
+def observe_stage(stage, filter_type, seconds):
+    STAGE_SECONDS.labels(stage, filter_label(filter_type)).observe(seconds)
+
+def observe_query(sql, started):
+    operation = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    SQLITE_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+class FrameCounter:
+    # Acumula frames localmente e publica em lotes: o contador não é tocado a cada frame. Uma passada
+    # com várias rendições soma os mesmos frames no contador de cada filtro
+    def __init__(self, *filter_types):
+        self.counters = [FRAMES_PROCESSED.labels(filter_label(filter_type)) for filter_type in filter_types]
+        self.frames_done = 0
+        self.published = 0
+
+    def update(self, frames_done):
+        self.frames_done = frames_done
+
+    def publish(self):
+        if self.frames_done > self.published:
+            for counter in self.counters:
+                counter.inc(self.frames_done - self.published)
+            self.published = self.frames_done
+
+class JobQueueCollector:
+    # Profundidade da fila lida do banco no momento da coleta
+    def __init__(self, count_jobs):
+        self.count_jobs = count_jobs
+
+    def collect(self):
+        gauge = GaugeMetricFamily('video_jobs', 'Jobs na fila por status', labels=['status'])
+        for status, count in self.count_jobs():
+            gauge.add_metric([status], count)
+        yield gauge
+
+def render_metrics(count_jobs):
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(JobQueueCollector(count_jobs))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,549 @@
+import os
+import math
+import time
+import json
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+from config import (FFMPEG_BIN, FFPROBE_BIN, FFMPEG_PRESET, FFMPEG_CRF, FFMPEG_NATIVE_FILTERS,
+                    SEGMENT_COUNT, SEGMENT_MIN_DURATION, HLS_SEGMENT_SECONDS, HLS_LADDER,
+                    THUMBNAIL_SIZE, THUMBNAIL_CANDIDATES, SPRITE_FRAMES, SPRITE_COLUMNS, SPRITE_TILE_WIDTH)
+from metrics import stage_timer, observe_stage
+from filters import FrameFilter, parse_chain, native_filtergraph
+
+# Codecs de áudio que podem ser copiados para MP4 sem reencode
+MP4_AUDIO_CODECS = {'aac', 'mp3', 'alac'}
+
+def get_video_info(video_path):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    duration = frame_count / fps if fps > 0 else 0
+    cap.release()
+    return duration, fps, width, height
+
+def probe_video(video_path):
+    cmd = [
+        FFPROBE_BIN, '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,width,height,avg_frame_rate,nb_frames'
+                         ':stream_side_data=rotation:stream_tags=rotate:format=duration,start_time',
+        '-of', 'json', video_path
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    data = json.loads(result.stdout)
+    
+    video_stream = next(s for s in data['streams'] if s['codec_type'] == 'video')
+    audio_stream = next((s for s in data['streams'] if s['codec_type'] == 'audio'), None)
+    
+    num, _, den = video_stream.get('avg_frame_rate', '0/0').partition('/')
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    duration = float(data.get('format', {}).get('duration') or 0)
+    frames = int(video_stream.get('nb_frames') or 0) or int(round(duration * fps))
+    # Vídeos de celular guardam a orientação na display matrix (ou na tag rotate, em arquivos antigos).
+    # O ffmpeg aplica a rotação ao decodificar, então largura/altura são as da imagem já girada
+    rotation = next((side_data['rotation'] for side_data in video_stream.get('side_data_list', [])
+                     if 'rotation' in side_data), video_stream.get('tags', {}).get('rotate', 0))
+    rotation = int(float(rotation)) % 360
+    width, height = int(video_stream['width']), int(video_stream['height'])
+    if rotation in (90, 270):
+        width, height = height, width
+    
+    return {
+        'width': width,
+        'height': height,
+        'rotation': rotation,
+        'fps': fps,
+        'frames': frames,
+        'duration': duration,
+        'start_time': float(data.get('format', {}).get('start_time') or 0),
+        'audio_codec': audio_stream['codec_name'] if audio_stream else None,
+    }
+
+def filter_frame(frame, filter_type):
+    # Conveniência para frames avulsos; loops devem reutilizar um FrameFilter
+    return FrameFilter(parse_chain(filter_type), frame.shape[0], frame.shape[1])(frame)
+
+# yuv420p exige dimensões pares
+EVEN_DIMENSIONS = 'scale=trunc(iw/2)*2:trunc(ih/2)*2'
+
+def keyframe_expression(interval, start=0.0):
+    # Keyframes em múltiplos absolutos de interval (para os segmentos HLS alinharem entre rendições);
+    # start é onde o trecho codificado começa no vídeo inteiro, quando os timestamps foram zerados
+    if not start:
+        return f'expr:gte(t,n_forced*{interval:g})'
+    skipped = math.ceil(start / interval - 1e-6)
+    return f'expr:gte(t+{start:.3f},(n_forced+{skipped})*{interval:g})'
+
+def _video_codec_args(keyframes=None):
+    args = ['-c:v', 'libx264', '-preset', FFMPEG_PRESET, '-crf', str(FFMPEG_CRF)]
+    if keyframes:
+        args += ['-force_key_frames', keyframes]
+    return args
+
+def _container_args(info, output_path):
+    return _audio_args(info) + ['-movflags', '+faststart', '-f', 'mp4', output_path]
+
+def _encoder_output_args(info, output_path, filtergraph=None, keyframes=None):
+    video_filter = EVEN_DIMENSIONS
+    if filtergraph:
+        video_filter = f'{filtergraph},{video_filter}'
+    args = _video_codec_args(keyframes) + ['-vf', video_filter, '-pix_fmt', 'yuv420p']
+    return args + _container_args(info, output_path)
+
+def _audio_args(info):
+    if not info['audio_codec']:
+        return []
+    # Copia o áudio quando o codec é aceito em MP4; senão converte para AAC
+    audio_codec = 'copy' if info['audio_codec'] in MP4_AUDIO_CODECS else 'aac'
+    return ['-c:a', audio_codec, '-shortest']
+
+def _read_errors(stderr_file):
+    # stderr vai para um arquivo temporário: um pipe cheio de avisos travaria o ffmpeg e quem escreve nele
+    stderr_file.seek(0)
+    errors = stderr_file.read().decode(errors='replace').strip()
+    stderr_file.close()
+    return errors
+
+def _discard(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def thumbnail_size(width, height, max_size=THUMBNAIL_SIZE):
+    if width > height:
+        return max_size, int(height * max_size / width)
+    return int(width * max_size / height), max_size
+
+def _thumbnail_step(info):
+    # Candidatos espaçados ao longo do vídeo, o primeiro no meio do intervalo (nunca o frame 0)
+    step = max(1, info['frames'] // THUMBNAIL_CANDIDATES) if info['frames'] else int(info['fps'] or 30)
+    return step, step // 2
+
+def _candidate_path(thumbnails, kind, index):
+    return f'{thumbnails}_{kind}_{index:03d}.jpg'
+
+def thumbnail_score(image):
+    # Contraste ponderado pela exposição: frames pretos, estourados ou em fade pontuam perto de zero
+    mean, stddev = cv2.meanStdDev(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    return float(stddev[0][0]) * (1 - abs(float(mean[0][0]) - 128) / 128)
+
+def choose_thumbnail(candidates_dir, thumbs_dir):
+    # Fica com o par (original, processado) cujo original tem a melhor pontuação
+    best_name, best_score = None, -1.0
+    names = sorted(os.listdir(candidates_dir)) if os.path.isdir(candidates_dir) else []
+    for name in names:
+        if '_original_' not in name:
+            continue
+        image = cv2.imread(os.path.join(candidates_dir, name))
+        if image is None:
+            continue
+        score = thumbnail_score(image)
+        if score > best_score:
+            best_name, best_score = name, score
+    
+    if best_name:
+        processed_name = best_name.replace('_original_', '_processed_')
+        os.replace(os.path.join(candidates_dir, best_name), os.path.join(thumbs_dir, "original.jpg"))
+        if processed_name in names:
+            os.replace(os.path.join(candidates_dir, processed_name), os.path.join(thumbs_dir, "processed.jpg"))
+    shutil.rmtree(candidates_dir, ignore_errors=True)
+    return best_name is not None
+
+def apply_filter(input_path, output_path, filter_type, progress_callback=None, thumbnails=None, keyframes=None):
+    apply_filters(input_path, [(filter_type, output_path)], progress_callback, thumbnails, keyframes)
+
+def apply_filters(input_path, outputs, progress_callback=None, thumbnails=None, keyframes=None):
+    # outputs: [(cadeia, caminho de saída)]. O original é decodificado uma única vez e cada
+    # frame segue para N ramos (filtro + encoder), em vez de um decode completo por saída.
+    # thumbnails: prefixo dos candidatos a thumbnail (original e primeira saída) tirados na mesma passada
+    # keyframes: valor de -force_key_frames para todas as saídas (ver keyframe_expression)
+    chains = [parse_chain(filter_type) for filter_type, _ in outputs]
+    info = probe_video(input_path)
+    filtergraphs = [native_filtergraph(chain) for chain in chains] if FFMPEG_NATIVE_FILTERS else [None]
+    if all(filtergraphs):
+        _apply_native_filters(input_path, [(graph, output_path) for graph, (_, output_path)
+                                           in zip(filtergraphs, outputs)], info, progress_callback, thumbnails, keyframes)
+    else:
+        _apply_frame_filters(input_path, [(filter_type, chain, output_path) for chain, (filter_type, output_path)
+                                          in zip(chains, outputs)], info, progress_callback, thumbnails, keyframes)
+
+def _apply_native_filters(input_path, outputs, info, progress_callback, thumbnails=None, keyframes=None):
+    # Uma única chamada do ffmpeg: decode, filtro em C e encode sem passar pelo Python
+    temp_output_paths = [output_path + '.part' for _, output_path in outputs]
+    if len(outputs) == 1 and not thumbnails:
+        output_args = ['-map', '0:v:0', '-map', '0:a:0?'] + \
+            _encoder_output_args(info, temp_output_paths[0], outputs[0][0], keyframes)
+    else:
+        # split duplica os frames decodificados; cada ramo tem seu filtergraph e seu encoder
+        graph = []
+        source = '[0:v:0]'
+        if thumbnails:
+            # Candidatos a thumbnail: os mesmos frames do original e da primeira saída, já reduzidos
+            step, offset = _thumbnail_step(info)
+            width, height = thumbnail_size(info['width'], info['height'])
+            select = f"select='eq(mod(n,{step}),{offset})',scale={width}:{height}"
+            graph += [f'{source}split=2[source][original]', f'[original]{select}[thumb_original]']
+            source = '[source]'
+        graph.append(f"{source}split={len(outputs)}{''.join(f'[v{i}]' for i in range(len(outputs)))}")
+        output_args = []
+        for i, ((filtergraph, _), temp_output_path) in enumerate(zip(outputs, temp_output_paths)):
+            if i == 0 and thumbnails:
+                graph += [f'[v0]{filtergraph},split=2[f0][processed]', f'[processed]{select}[thumb_processed]',
+                          f'[f0]{EVEN_DIMENSIONS}[out0]']
+            else:
+                graph.append(f'[v{i}]{filtergraph},{EVEN_DIMENSIONS}[out{i}]')
+            output_args += ['-map', f'[out{i}]', '-map', '0:a:0?'] + _video_codec_args(keyframes) + \
+                ['-pix_fmt', 'yuv420p'] + _container_args(info, temp_output_path)
+        if thumbnails:
+            for kind in ('original', 'processed'):
+                output_args += ['-map', f'[thumb_{kind}]', '-fps_mode', 'passthrough', '-q:v', '3',
+                                '-f', 'image2', f'{thumbnails}_{kind}_%03d.jpg']
+        output_args = ['-filter_complex', ';'.join(graph)] + output_args
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen([
+        FFMPEG_BIN, '-v', 'error', '-y', '-nostats', '-progress', 'pipe:1', '-i', input_path,
+    ] + output_args, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+    
+    try:
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key == 'frame' and progress_callback:
+                progress_callback(int(value), info['frames'])
+        process.wait()
+        errors = _read_errors(stderr_file)
+    except Exception:
+        process.kill()
+        process.wait()
+        stderr_file.close()
+        for temp_output_path in temp_output_paths:
+            _discard(temp_output_path)
+        raise
+    
+    if process.returncode != 0:
+        for temp_output_path in temp_output_paths:
+            _discard(temp_output_path)
+        raise RuntimeError(f"ffmpeg falhou ao processar o vídeo: {errors}")
+    
+    for temp_output_path, (_, output_path) in zip(temp_output_paths, outputs):
+        os.replace(temp_output_path, output_path)
+
+class _EncoderBranch:
+    # Um ramo do fan-out: estágios OpenCV da cadeia + encoder H.264 próprio
+    def __init__(self, input_path, filter_type, chain, output_path, info, keyframes=None):
+        width, height = info['width'], info['height']
+        self.filter_type = filter_type
+        self.output_path = output_path
+        self.temp_output_path = output_path + '.part'
+        self.frame_filter = FrameFilter(chain, height, width)
+        self.last_frame = None
+        self.filter_seconds = self.write_seconds = 0.0
+        # Encoder: frames filtrados pelo stdin + áudio lido direto do original
+        self.stderr = tempfile.TemporaryFile()
+        self.encoder = subprocess.Popen([
+            FFMPEG_BIN, '-v', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}',
+            '-framerate', str(info['fps'] or 30), '-i', 'pipe:0',
+            '-i', input_path, '-map', '0:v:0', '-map', '1:a:0?',
+        ] + _encoder_output_args(info, self.temp_output_path, keyframes=keyframes),
+            stdin=subprocess.PIPE, stderr=self.stderr)
+
+    def write(self, frame):
+        started = time.perf_counter()
+        filtered = self.last_frame = self.frame_filter(frame)
+        written_at = time.perf_counter()
+        try:
+            self.encoder.stdin.write(filtered)
+        except BrokenPipeError:
+            # Encoder morreu; o erro dele é reportado em close()
+            return False
+        self.filter_seconds += written_at - started
+        self.write_seconds += time.perf_counter() - written_at
+        return True
+
+    def close(self):
+        try:
+            self.encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.encoder.wait()
+        self.errors = _read_errors(self.stderr)
+        observe_stage('frame_filter', self.filter_type, self.filter_seconds)
+        observe_stage('frame_write', self.filter_type, self.write_seconds)
+        return self.encoder.returncode
+
+def _apply_frame_filters(input_path, outputs, info, progress_callback, thumbnails=None, keyframes=None):
+    width, height = info['width'], info['height']
+    frame_size = width * height * 3
+    thumbnail_step, thumbnail_offset = _thumbnail_step(info)
+    thumb_size = thumbnail_size(width, height)
+    candidates = 0
+    
+    # Decoder: frames BGR crus no stdout
+    decoder = subprocess.Popen([
+        FFMPEG_BIN, '-v', 'error', '-i', input_path,
+        '-map', '0:v:0', '-fps_mode', 'passthrough',
+        '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1'
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    branches = []
+    
+    # O decoder escreve sempre no mesmo buffer; cada ramo devolve sempre o mesmo array de saída
+    raw = bytearray(frame_size)
+    frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 3))
+    # Com mais de um ramo, filtros e escritas rodam em threads (OpenCV e pipes liberam o GIL)
+    pool = ThreadPoolExecutor(max_workers=len(outputs)) if len(outputs) > 1 else None
+    
+    frames_done = 0
+    read_seconds = 0.0
+    returncodes = []
+    try:
+        for filter_type, chain, output_path in outputs:
+            branches.append(_EncoderBranch(input_path, filter_type, chain, output_path, info, keyframes))
+        while True:
+            started = time.perf_counter()
+            if decoder.stdout.readinto(raw) < frame_size:
+                break
+            read_seconds += time.perf_counter() - started
+            
+            if pool:
+                written = all(pool.map(lambda branch: branch.write(frame), branches))
+            else:
+                written = branches[0].write(frame)
+            if not written:
+                break
+            
+            if thumbnails and frames_done % thumbnail_step == thumbnail_offset:
+                # Candidatos a thumbnail saem dos frames já decodificados, sem abrir o vídeo de novo
+                candidates += 1
+                for kind, image in (('original', frame), ('processed', branches[0].last_frame)):
+                    cv2.imwrite(_candidate_path(thumbnails, kind, candidates),
+                                cv2.resize(image, thumb_size, interpolation=cv2.INTER_AREA))
+            
+            frames_done += 1
+            if progress_callback:
+                progress_callback(frames_done, info['frames'])
+    except Exception:
+        for branch in branches:
+            branch.encoder.kill()
+            _discard(branch.temp_output_path)
+        raise
+    finally:
+        if pool:
+            pool.shutdown()
+        decoder.stdout.close()
+        decoder.wait()
+        returncodes = [branch.close() for branch in branches]
+        for filter_type, _, _ in outputs:
+            observe_stage('frame_read', filter_type, read_seconds)
+    
+    if decoder.returncode != 0 or any(returncodes) or frames_done == 0:
+        for branch in branches:
+            _discard(branch.temp_output_path)
+        errors = '; '.join(branch.errors for branch in branches if branch.errors)
+        raise RuntimeError(f"ffmpeg falhou ao processar o vídeo: {errors}")
+    
+    for branch in branches:
+        os.replace(branch.temp_output_path, branch.output_path)
+
+def link_or_copy(source_path, target_path):
+    # Hardlink quando possível: mesmo conteúdo sem ocupar espaço de novo
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+def generate_hls(video_path, hls_dir, ladder=HLS_LADDER, keyframes_aligned=True):
+    # Rendição 0 é o próprio vídeo processado remuxado; a escada adiciona versões menores.
+    # keyframes_aligned: o vídeo foi codificado com keyframe_expression(HLS_SEGMENT_SECONDS); senão
+    # a rendição 0 é recodificada, porque a cópia herdaria o GOP do x264 e os cortes não bateriam
+    info = probe_video(video_path)
+    heights = sorted((h for h in ladder if h < info['height']), reverse=True)
+    has_audio = info['audio_codec'] is not None
+    
+    args = ['-i', video_path]
+    if heights:
+        outputs = ''.join(f'[s{i}]' for i in range(len(heights)))
+        scales = ';'.join(f'[s{i}]scale=-2:{h}[v{i}]' for i, h in enumerate(heights))
+        args += ['-filter_complex', f'[0:v]split={len(heights)}{outputs};{scales}']
+    
+    args += ['-map', '0:v:0'] + [arg for i in range(len(heights)) for arg in ('-map', f'[v{i}]')]
+    if has_audio:
+        args += ['-map', '0:a:0'] * (len(heights) + 1)
+        args += ['-c:a', 'copy' if info['audio_codec'] in ('aac', 'mp3') else 'aac']
+    
+    if keyframes_aligned:
+        args += ['-c:v:0', 'copy']
+    for i in range(1 if keyframes_aligned else 0, len(heights) + 1):
+        args += [f'-c:v:{i}', 'libx264', '-preset', FFMPEG_PRESET, '-crf', str(FFMPEG_CRF),
+                 f'-force_key_frames:v:{i}', keyframe_expression(HLS_SEGMENT_SECONDS)]
+    
+    variants = range(len(heights) + 1)
+    stream_map = ' '.join(f'v:{i},a:{i}' if has_audio else f'v:{i}' for i in variants)
+    
+    temp_dir = hls_dir + '.part'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    try:
+        _run_ffmpeg(args + [
+            '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(temp_dir, '%v', 'seg_%04d.ts'),
+            '-master_pl_name', 'master.m3u8', '-var_stream_map', stream_map,
+            os.path.join(temp_dir, '%v', 'index.m3u8')
+        ])
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    
+    shutil.rmtree(hls_dir, ignore_errors=True)
+    os.rename(temp_dir, hls_dir)
+
+def _sample_times(duration, count):
+    return [(i + 0.5) * duration / count for i in range(count)]
+
+def _seek_inputs(video_path, timestamps):
+    # -ss antes de -i busca pelo índice até o keyframe anterior, sem ler o vídeo desde o início
+    args = []
+    for timestamp in timestamps:
+        args += ['-ss', f'{timestamp:.3f}', '-i', video_path]
+    return args
+
+def _seek_frame(index, width, height, offset=0):
+    # Só o primeiro frame de cada entrada, com o mesmo timestamp para o xstack alinhar
+    return f'[{offset + index}:v:0]trim=end_frame=1,setpts=0,scale={width}:{height},setsar=1'
+
+def generate_thumbnails(original_path, processed_path, thumbs_dir):
+    # Para saídas que não passaram pelo pipeline (deduplicadas): candidatos por seek nos dois vídeos
+    info = probe_video(original_path)
+    if not info['duration']:
+        return False
+    timestamps = _sample_times(info['duration'], THUMBNAIL_CANDIDATES)
+    width, height = thumbnail_size(info['width'], info['height'])
+    candidates_dir = os.path.join(thumbs_dir, "candidates")
+    os.makedirs(candidates_dir, exist_ok=True)
+    
+    graph = []
+    output_args = []
+    for offset, kind in ((0, 'original'), (len(timestamps), 'processed')):
+        for i in range(len(timestamps)):
+            graph.append(f'{_seek_frame(i, width, height, offset)}[{kind}{i}]')
+            output_args += ['-map', f'[{kind}{i}]', '-frames:v', '1', '-q:v', '3', '-update', '1',
+                            _candidate_path(os.path.join(candidates_dir, 'seek'), kind, i + 1)]
+    _run_ffmpeg(_seek_inputs(original_path, timestamps) + _seek_inputs(processed_path, timestamps) +
+                ['-filter_complex', ';'.join(graph)] + output_args)
+    return choose_thumbnail(candidates_dir, thumbs_dir)
+
+def generate_sprite(video_path, thumbs_dir, frames=SPRITE_FRAMES, columns=SPRITE_COLUMNS,
+                    tile_width=SPRITE_TILE_WIDTH):
+    # Folha de quadros igualmente espaçados para scrubbing no hover; um seek por quadro, numa só chamada
+    info = probe_video(video_path)
+    if not frames or not info['duration']:
+        return None
+    tile_height = int(round(tile_width * info['height'] / info['width'] / 2)) * 2
+    columns = min(columns, frames)
+    rows = -(-frames // columns)
+    
+    graph = [f'{_seek_frame(i, tile_width, tile_height)}[t{i}]' for i in range(frames)]
+    layout = '|'.join(f'{(i % columns) * tile_width}_{(i // columns) * tile_height}' for i in range(frames))
+    graph.append(f"{''.join(f'[t{i}]' for i in range(frames))}"
+                 f"xstack=inputs={frames}:layout={layout}:fill=black[sprite]")
+    sprite_path = os.path.join(thumbs_dir, "sprite.jpg")
+    _run_ffmpeg(_seek_inputs(video_path, _sample_times(info['duration'], frames)) + [
+        '-filter_complex', ';'.join(graph), '-map', '[sprite]',
+        '-frames:v', '1', '-q:v', '4', '-update', '1', sprite_path + '.part.jpg'
+    ])
+    os.replace(sprite_path + '.part.jpg', sprite_path)
+    
+    sprite = {
+        'frames': frames,
+        'columns': columns,
+        'rows': rows,
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'interval': info['duration'] / frames,
+    }
+    with open(os.path.join(thumbs_dir, "sprite.json"), 'w') as f:
+        json.dump(sprite, f)
+    return sprite
+
+PROCESSING_MODES = ('auto', 'single', 'segmented')
+
+def choose_segment_count(mode, duration):
+    # mode: 'single', 'segmented' ou 'auto' (segmenta vídeos longos)
+    if mode == 'single':
+        return 1
+    if mode == 'segmented':
+        return max(2, SEGMENT_COUNT)
+    if duration >= SEGMENT_MIN_DURATION:
+        return SEGMENT_COUNT
+    return 1
+
+def fit_segment_count(segments, busy_jobs):
+    # Chamado no claim: cada outro job em andamento ocupa ao menos um núcleo
+    if segments <= 1:
+        return segments
+    return min(segments, max(2, (os.cpu_count() or 1) - busy_jobs))
+
+def _run_ffmpeg(args):
+    result = subprocess.run([FFMPEG_BIN, '-v', 'error', '-y'] + args, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg falhou: {result.stderr.strip()}")
+
+def _filter_segment(segment_path, output_path, filter_type, thumbnails=None, keyframes=None):
+    apply_filter(segment_path, output_path, filter_type, thumbnails=thumbnails, keyframes=keyframes)
+    return probe_video(output_path)['frames']
+
+def apply_filter_segmented(input_path, output_path, filter_type, num_segments, progress_callback=None,
+                           thumbnails=None, keyframe_interval=None):
+    info = probe_video(input_path)
+    work_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(output_path))
+    try:
+        # Passo 1: dividir só o vídeo em keyframes, sem reencode. Os segmentos mantêm os timestamps
+        # do original (o encode de cada um recomeça em zero mesmo assim) para se saber onde começam
+        segment_time = max(info['duration'] / num_segments, 1.0)
+        with stage_timer('segment_split', filter_type):
+            _run_ffmpeg([
+                '-i', input_path, '-map', '0:v:0', '-c', 'copy',
+                '-f', 'segment', '-segment_time', f'{segment_time:.3f}', '-reset_timestamps', '0',
+                os.path.join(work_dir, 'in_%04d.mkv')
+            ])
+        segments = sorted(name for name in os.listdir(work_dir) if name.startswith('in_'))
+        keyframes = [None] * len(segments)
+        if keyframe_interval:
+            # Keyframes forçados a partir da posição de cada segmento no vídeo final; o início do
+            # primeiro é só o atraso dos B-frames
+            starts = [probe_video(os.path.join(work_dir, name))['start_time'] for name in segments]
+            keyframes = [keyframe_expression(keyframe_interval, start - starts[0]) for start in starts]
+        outputs = [os.path.join(work_dir, name.replace('in_', 'out_').replace('.mkv', '.mp4'))
+                   for name in segments]
+        
+        # Passo 2: filtrar os segmentos em paralelo, um processo por segmento
+        frames_done = 0
+        with ProcessPoolExecutor(max_workers=min(num_segments, len(segments))) as pool:
+            futures = [pool.submit(_filter_segment, os.path.join(work_dir, name), out, filter_type,
+                                   thumbnails and f'{thumbnails}_{i:04d}',
+                                   keyframes[i])
+                       for i, (name, out) in enumerate(zip(segments, outputs))]
+            for future in as_completed(futures):
+                frames_done += future.result()
+                if progress_callback:
+                    progress_callback(frames_done, max(info['frames'], frames_done))
+        
+        # Passo 3: concatenar sem reencode e recolocar o áudio original
+        list_path = os.path.join(work_dir, 'segments.txt')
+        with open(list_path, 'w') as f:
+            for out in outputs:
+                f.write(f"file '{os.path.basename(out)}'\n")
+        
+        temp_output_path = os.path.join(work_dir, 'output.mp4')
+        with stage_timer('segment_concat', filter_type):
+            _run_ffmpeg([
+                '-f', 'concat', '-safe', '0', '-i', list_path, '-i', input_path,
+                '-map', '0:v:0', '-map', '1:a:0?', '-c:v', 'copy',
+            ] + _audio_args(info) + ['-movflags', '+faststart', '-f', 'mp4', temp_output_path])
+        os.replace(temp_output_path, output_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Os módulos do backend são importados como top-level (como o app.py faz) e leem o ambiente
+# na importação: banco, mídia e métricas vão para um diretório temporário
+TEST_ROOT = tempfile.mkdtemp(prefix='backend_tests_')
+os.environ.setdefault("MEDIA_ROOT", os.path.join(TEST_ROOT, "media"))
+os.environ.setdefault("DATABASE_PATH", os.path.join(TEST_ROOT, "videos.db"))
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(TEST_ROOT, "metrics"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
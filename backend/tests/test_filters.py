@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+
+from filters import FrameFilter, parse_chain, SEPIA_KERNEL
+
+HEIGHT, WIDTH = 72, 96
+
+def baseline_filter_frame(frame, filter_type):
+    # filter_frame original do app.py, antes do registro de filtros
+    if filter_type == 'grayscale':
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    elif filter_type == 'blur':
+        frame = cv2.GaussianBlur(frame, (15, 15), 0)
+    elif filter_type == 'edge':
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        edges = cv2.Canny(gray, 100, 200)
+        frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+    elif filter_type == 'brightness':
+        frame = cv2.convertScaleAbs(frame, alpha=1.0, beta=50)
+    elif filter_type == 'sepia':
+        kernel = np.array([[0.272, 0.534, 0.131],
+                           [0.349, 0.686, 0.168],
+                           [0.393, 0.769, 0.189]])
+        frame = cv2.transform(frame, kernel)
+    return frame
+
+@pytest.fixture
+def frames():
+    # Ruído (saturação e bordas por toda parte) e um gradiente suave com retângulos
+    rng = np.random.default_rng(0)
+    noise = [rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(3)]
+    gradient = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    gradient[..., 0] = np.linspace(0, 255, WIDTH, dtype=np.uint8)
+    gradient[..., 1] = np.linspace(0, 255, HEIGHT, dtype=np.uint8)[:, None]
+    gradient[..., 2] = 255 - gradient[..., 0]
+    cv2.rectangle(gradient, (10, 10), (40, 50), (250, 250, 250), -1)
+    cv2.rectangle(gradient, (50, 20), (90, 60), (5, 5, 5), -1)
+    return noise + [gradient]
+
+@pytest.mark.parametrize('filter_type', ['grayscale', 'blur', 'edge', 'brightness', 'sepia'])
+def test_frame_filter_matches_baseline(filter_type, frames):
+    frame_filter = FrameFilter(parse_chain(filter_type), HEIGHT, WIDTH)
+    for frame in frames:
+        # O FrameFilter reutiliza seus buffers: cada frame é conferido antes do próximo
+        expected = baseline_filter_frame(frame.copy(), filter_type)
+        output = frame_filter(frame)
+        assert output.dtype == np.uint8
+        assert output.shape == expected.shape
+        assert np.array_equal(output, expected)
+
+def test_frame_filter_does_not_modify_input(frames):
+    frame = frames[0]
+    original = frame.copy()
+    FrameFilter(parse_chain('blur|sepia'), HEIGHT, WIDTH)(frame)
+    assert np.array_equal(frame, original)
+
+def test_chain_matches_baseline_stages(frames):
+    frame_filter = FrameFilter(parse_chain('grayscale|brightness'), HEIGHT, WIDTH)
+    for frame in frames:
+        expected = baseline_filter_frame(baseline_filter_frame(frame.copy(), 'grayscale'), 'brightness')
+        assert np.array_equal(frame_filter(frame), expected)
+
+def test_sepia_within_one_lsb_of_float_reference(frames):
+    # cv2.transform em uint8 arredonda em ponto fixo; multiplicar em float e saturar
+    # pode dar 1 a mais ou a menos, nunca mais que isso
+    frame_filter = FrameFilter(parse_chain('sepia'), HEIGHT, WIDTH)
+    for frame in frames:
+        reference = np.clip(np.rint(frame.astype(np.float64) @ SEPIA_KERNEL.T), 0, 255)
+        difference = np.abs(frame_filter(frame).astype(np.int16) - reference.astype(np.int16))
+        assert difference.max() <= 1
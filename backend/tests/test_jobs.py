@@ -0,0 +1,88 @@
+import signal
+import sqlite3
+import sys
+
+import pytest
+
+import app as appmod
+import jobs
+from database import get_connection
+from events import EVENT_JOB_DONE
+
+class StopLoop(Exception):
+    pass
+
+@pytest.fixture
+def worker(monkeypatch):
+    appmod.init_database()
+    conn = get_connection(autocommit=True)
+    conn.execute('DELETE FROM jobs')
+    # O worker roda no próprio processo do teste: sem grupo de processos nem handler de SIGTERM
+    monkeypatch.setattr(jobs.os, 'setpgid', lambda pid, pgid: None)
+    monkeypatch.setattr(jobs.signal, 'signal', lambda signum, handler: None)
+    monkeypatch.setattr(jobs.time, 'sleep', lambda seconds: None)
+    return conn
+
+def fail_once(monkeypatch, name, error):
+    original = getattr(jobs, name)
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise error
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, name, wrapper)
+    return calls
+
+def run_until_queue_empty(monkeypatch):
+    claim = jobs.claim_next_job
+
+    def claim_or_stop(conn):
+        job = claim(conn)
+        if job is None:
+            raise StopLoop
+        return job
+
+    monkeypatch.setattr(jobs, 'claim_next_job', claim_or_stop)
+    with pytest.raises(StopLoop):
+        jobs._worker_loop()
+
+def test_worker_retries_claim_and_result_after_lock_errors(worker, monkeypatch):
+    handled = []
+    monkeypatch.setitem(jobs.JOB_HANDLERS, jobs.JOB_PROCESS, lambda conn, job: handled.append(job['id']))
+    job_id = jobs.enqueue_job(worker.cursor(), 'video-2', {})
+    publishes = fail_once(monkeypatch, 'publish_event', sqlite3.OperationalError('database is locked'))
+    claims = fail_once(monkeypatch, 'claim_next_job', sqlite3.OperationalError('database is locked'))
+    run_until_queue_empty(monkeypatch)
+
+    assert len(claims) >= 2
+    assert len(publishes) == 2
+    assert handled == [job_id]
+    job = jobs.get_job(job_id)
+    assert job['status'] == jobs.JOB_DONE and job['error'] is None
+    # A tentativa que falhou foi desfeita: um único evento de conclusão
+    done_events = worker.execute("SELECT COUNT(*) FROM events WHERE type = ? AND data LIKE ?",
+                                 (EVENT_JOB_DONE, f'%{job_id}%')).fetchone()[0]
+    assert done_events == 1
+
+def test_failed_job_is_recorded_after_lock_error(worker, monkeypatch):
+    def broken(conn, job):
+        raise RuntimeError('ffmpeg falhou')
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, jobs.JOB_PROCESS, broken)
+    job_id = jobs.enqueue_job(worker.cursor(), 'video-3', {})
+    fail_once(monkeypatch, 'publish_event', sqlite3.OperationalError('database is locked'))
+    run_until_queue_empty(monkeypatch)
+
+    job = jobs.get_job(job_id)
+    assert job['status'] == jobs.JOB_FAILED and job['error'] == 'ffmpeg falhou'
+
+def test_stop_worker_pool_ignores_further_sigterm():
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        jobs.stop_worker_pool([])
+        assert signal.getsignal(signal.SIGTERM) is signal.SIG_IGN
+    finally:
+        signal.signal(signal.SIGTERM, previous)
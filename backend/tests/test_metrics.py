@@ -0,0 +1,21 @@
+from metrics import filter_label, FrameCounter, FRAMES_PROCESSED
+
+def test_filter_label_keeps_only_registered_names():
+    assert filter_label('blur(sigma=3.7)|edge') == 'blur|edge'
+    assert filter_label('blur(sigma=1.25)|edge(low=10)') == 'blur|edge'
+    assert filter_label('edge|edge|blur|edge') == 'edge|blur'
+    assert filter_label('grayscale') == 'grayscale'
+
+def test_filter_label_collapses_unparseable_chains():
+    assert filter_label('nope(x=1)') == 'invalid'
+    assert filter_label('') == ''
+    assert filter_label(None) == ''
+
+def test_frame_counter_counts_every_rendition_filter():
+    before = {name: FRAMES_PROCESSED.labels(name)._value.get() for name in ('edge', 'blur|edge')}
+    counter = FrameCounter('edge', 'blur(sigma=3)|edge')
+    counter.update(30)
+    counter.publish()
+    counter.publish()
+    assert FRAMES_PROCESSED.labels('edge')._value.get() == before['edge'] + 30
+    assert FRAMES_PROCESSED.labels('blur|edge')._value.get() == before['blur|edge'] + 30
@@ -0,0 +1,64 @@
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+import pytest
+
+import processing
+from config import FFMPEG_BIN
+from filters import FILTER_REGISTRY
+
+pytestmark = pytest.mark.skipif(shutil.which(FFMPEG_BIN) is None, reason="ffmpeg not available")
+
+# (diferença máxima por pixel, fração mínima de pixels dentro dela). O edgedetect do ffmpeg e o
+# Canny do OpenCV afinam e ligam bordas de modo diferente, então só a maior parte dos pixels coincide
+TOLERANCES = {
+    'grayscale': (8, 0.99),
+    'blur': (16, 0.99),
+    'edge': (16, 0.85),
+    'brightness': (16, 0.99),
+    'sepia': (8, 1.0),
+}
+DEFAULT_TOLERANCE = (16, 0.99)
+
+NATIVE_FILTERS = [name for name, filter_ in FILTER_REGISTRY.items()
+                  if filter_.ffmpeg({key: param.default for key, param in filter_.params.items()})]
+
+@pytest.fixture(scope='module')
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('parity') / 'clip.mp4')
+    subprocess.run([FFMPEG_BIN, '-v', 'error', '-y', '-f', 'lavfi',
+                    '-i', 'testsrc2=size=160x120:rate=10:duration=1',
+                    '-c:v', 'libx264', '-crf', '0', '-pix_fmt', 'yuv420p', path], check=True)
+    return path
+
+def read_frames(path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return np.array(frames, dtype=np.int16)
+
+@pytest.mark.parametrize('filter_type', NATIVE_FILTERS)
+def test_native_matches_opencv(filter_type, clip, tmp_path, monkeypatch):
+    # Encode sem perdas nos dois caminhos para comparar só os filtros, não o ruído do x264
+    monkeypatch.setattr(processing, 'FFMPEG_CRF', 0)
+    outputs = []
+    for native in (True, False):
+        monkeypatch.setattr(processing, 'FFMPEG_NATIVE_FILTERS', native)
+        output_path = str(tmp_path / f'{filter_type}_{"native" if native else "opencv"}.mp4')
+        processing.apply_filter(clip, output_path, filter_type)
+        outputs.append(read_frames(output_path))
+    native_frames, opencv_frames = outputs
+    assert len(native_frames) > 0
+    assert native_frames.shape == opencv_frames.shape
+
+    max_diff, min_fraction = TOLERANCES.get(filter_type, DEFAULT_TOLERANCE)
+    within = np.abs(native_frames - opencv_frames) <= max_diff
+    assert within.mean() >= min_fraction, \
+        f"{filter_type}: {within.mean():.4f} of pixels within {max_diff}, expected {min_fraction}"
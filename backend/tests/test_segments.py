@@ -0,0 +1,27 @@
+import os
+import runpy
+
+import processing
+
+CONFIG_PATH = os.path.join(os.path.dirname(processing.__file__), 'config.py')
+
+def default_settings(monkeypatch, cpus):
+    monkeypatch.delenv('SEGMENT_COUNT', raising=False)
+    monkeypatch.delenv('JOB_WORKERS', raising=False)
+    monkeypatch.setattr(os, 'cpu_count', lambda: cpus)
+    return runpy.run_path(CONFIG_PATH)
+
+def test_auto_segments_long_clip_with_default_config(monkeypatch):
+    settings = default_settings(monkeypatch, 8)
+    monkeypatch.setattr(processing, 'SEGMENT_COUNT', settings['SEGMENT_COUNT'])
+    monkeypatch.setattr(processing, 'SEGMENT_MIN_DURATION', settings['SEGMENT_MIN_DURATION'])
+    assert processing.choose_segment_count('auto', settings['SEGMENT_MIN_DURATION'] + 1) == 8
+    assert processing.choose_segment_count('auto', settings['SEGMENT_MIN_DURATION'] - 1) == 1
+    # Sozinho na máquina, o job fica com todos os núcleos
+    assert processing.fit_segment_count(8, busy_jobs=0) == 8
+
+def test_fit_segment_count_leaves_cores_to_running_jobs(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    assert processing.fit_segment_count(8, busy_jobs=3) == 5
+    assert processing.fit_segment_count(8, busy_jobs=7) == 2
+    assert processing.fit_segment_count(1, busy_jobs=0) == 1
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import app as appmod
+import jobs
+from database import get_connection
+from ingest import received_ranges, hash_file, UPLOAD_FINALIZED
+
+CONTENT = bytes(range(256)) * 40
+CHUNK = 4096
+
+def test_received_ranges_merges_out_of_order_and_overlapping_chunks():
+    assert received_ranges([]) == []
+    assert received_ranges([(8192, 2048), (0, 4096), (4096, 4096)]) == [[0, 10240]]
+    assert received_ranges([(4096, 100), (0, 100)]) == [[0, 100], [4096, 4196]]
+    # Bloco reenviado por cima de outro
+    assert received_ranges([(0, 4096), (1024, 1024), (3000, 2000)]) == [[0, 5000]]
+
+@pytest.fixture
+def client(monkeypatch):
+    appmod.init_database()
+    # O conteúdo não é um vídeo: o probe não interessa aqui
+    monkeypatch.setattr(appmod, 'get_video_info', lambda path: (1.0, 25.0, 16, 16))
+    return appmod.app.test_client()
+
+def open_session(client, content=CONTENT):
+    response = client.post('/uploads', json={'filename': 'clip.mp4', 'size': len(content), 'filter': 'grayscale'})
+    assert response.status_code == 201
+    return response.json['upload_id']
+
+def put_chunk(client, upload_id, offset, content=CONTENT):
+    return client.put(f'/uploads/{upload_id}', data=content[offset:offset + CHUNK],
+                      headers={'Upload-Offset': str(offset)})
+
+def test_out_of_order_chunks_report_ranges_until_complete(client):
+    upload_id = open_session(client)
+    for offset in (8192, 0):
+        assert put_chunk(client, upload_id, offset).status_code == 200
+    upload = client.get(f'/uploads/{upload_id}').json['upload']
+    assert upload['ranges'] == [[0, 4096], [8192, len(CONTENT)]]
+    assert upload['received_bytes'] == 4096 + len(CONTENT) - 8192
+
+    response = client.post(f'/uploads/{upload_id}/finalize')
+    assert response.status_code == 409
+    assert response.json['ranges'] == [[0, 4096], [8192, len(CONTENT)]]
+
+    assert put_chunk(client, upload_id, 4096).status_code == 200
+    assert client.get(f'/uploads/{upload_id}').json['upload']['ranges'] == [[0, len(CONTENT)]]
+    assert client.post(f'/uploads/{upload_id}/finalize').status_code == 202
+
+def test_invalid_chunk_offset_is_rejected(client):
+    upload_id = open_session(client)
+    response = client.put(f'/uploads/{upload_id}', data=b'x' * 10, headers={'Upload-Offset': str(len(CONTENT) - 5)})
+    assert response.status_code == 400
+
+def test_repeated_finalize_returns_the_same_video_and_job(client):
+    upload_id = open_session(client)
+    for offset in range(0, len(CONTENT), CHUNK):
+        put_chunk(client, upload_id, offset)
+    first = client.post(f'/uploads/{upload_id}/finalize')
+    assert first.status_code == 202
+
+    again = client.post(f'/uploads/{upload_id}/finalize')
+    assert again.status_code == 200
+    assert (again.json['video_id'], again.json['job_id']) == (first.json['video_id'], first.json['job_id'])
+    upload = client.get(f'/uploads/{upload_id}').json['upload']
+    assert upload['status'] == UPLOAD_FINALIZED
+    assert upload['job_id'] == first.json['job_id']
+    # Blocos de sessão finalizada não são mais aceitos
+    assert put_chunk(client, upload_id, 0).status_code == 409
+
+def test_job_hashes_finalized_upload_and_links_duplicate_original(client):
+    videos = []
+    for _ in range(2):
+        upload_id = open_session(client)
+        for offset in range(0, len(CONTENT), CHUNK):
+            put_chunk(client, upload_id, offset)
+        videos.append(client.post(f'/uploads/{upload_id}/finalize').json['video_id'])
+
+    conn = get_connection(autocommit=True)
+    rows = conn.execute('SELECT id, path_original, checksum_blake2b FROM videos WHERE id IN (?, ?)', videos).fetchall()
+    paths = {video_id: path for video_id, path, _ in rows}
+    # O finalize não lê o upload: o hash fica para o job
+    assert all(blake2b is None for _, _, blake2b in rows)
+
+    digests = hash_file(paths[videos[0]])
+    for video_id in videos:
+        jobs.store_digests(conn, video_id, paths[video_id], digests)
+    stored = conn.execute('SELECT checksum, checksum_blake2b FROM videos WHERE id IN (?, ?)', videos).fetchall()
+    assert stored == [(digests['checksum'], digests['blake2b'])] * 2
+    assert os.path.samefile(paths[videos[0]], paths[videos[1]])
+    with open(paths[videos[1]], 'rb') as f:
+        assert f.read() == CONTENT
@@ -0,0 +1,128 @@
+import base64
+import json
+
+import pytest
+
+import app as appmod
+from database import get_connection
+from videos import encode_cursor, decode_cursor, list_videos_page, library_stats
+
+# (id, created_at, filtro, bytes, removido): dois vídeos no mesmo instante testam o desempate por id
+VIDEOS = [
+    ('v1', '2024-01-01T10:00:00', 'grayscale', 100, 0),
+    ('v2', '2024-01-02T10:00:00', 'blur', 200, 0),
+    ('v3', '2024-01-02T10:00:00', 'grayscale', 300, 0),
+    ('v4', '2024-01-03T10:00:00', 'edge', 400, 1),
+    ('v5', '2024-01-04T10:00:00', 'blur', 500, 0),
+    ('v6', '2024-01-05T10:00:00', 'sepia', 600, 0),
+    ('v7', '2024-01-06T10:00:00', 'grayscale', 700, 0),
+]
+EXPECTED_ORDER = ['v7', 'v6', 'v5', 'v3', 'v2', 'v1']
+
+def insert_video(cursor, video_id, created_at, filter_type, size_bytes, is_deleted=0):
+    cursor.execute('''
+        INSERT INTO videos (id, original_name, filter, size_bytes, created_at, is_deleted)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (video_id, f'{video_id}.mp4', filter_type, size_bytes, created_at, is_deleted))
+
+@pytest.fixture
+def cursor():
+    appmod.init_database()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM videos')
+    for video in VIDEOS:
+        insert_video(cursor, *video)
+    conn.commit()
+    yield cursor
+    cursor.execute('DELETE FROM videos')
+    conn.commit()
+
+def all_pages(cursor, limit):
+    ids, after, pages = [], None, 0
+    while True:
+        videos, next_cursor = list_videos_page(cursor, ('id',), limit=limit, after=after)
+        ids.extend(video['id'] for video in videos)
+        pages += 1
+        if next_cursor is None:
+            return ids, pages
+        after = decode_cursor(next_cursor)
+
+@pytest.mark.parametrize('limit', [1, 2, 4, 5, 50])
+def test_pages_follow_created_at_then_id(cursor, limit):
+    ids, pages = all_pages(cursor, limit)
+    assert ids == EXPECTED_ORDER
+    assert pages == -(-len(EXPECTED_ORDER) // limit)
+
+def test_last_page_has_no_cursor(cursor):
+    # Página final exatamente cheia: não aponta para uma página vazia
+    videos, next_cursor = list_videos_page(cursor, ('id',), limit=3, after=decode_cursor(encode_cursor(
+        '2024-01-04T10:00:00', 'v5')))
+    assert [video['id'] for video in videos] == ['v3', 'v2', 'v1']
+    assert next_cursor is None
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('2024-01-02T10:00:00', 'v3')) == ('2024-01-02T10:00:00', 'v3')
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+BAD_CURSORS = ['not base64!', base64.urlsafe_b64encode(b'{nope').decode(), raw_cursor([1, {}]),
+               raw_cursor(['2024-01-01']), raw_cursor(['2024-01-01', 'v1', 'x']), raw_cursor({'a': 1}),
+               raw_cursor(['2024-01-01', None]), raw_cursor('v1')]
+
+@pytest.mark.parametrize('value', BAD_CURSORS)
+def test_bad_cursor_is_rejected(value):
+    with pytest.raises(ValueError):
+        decode_cursor(value)
+
+@pytest.mark.parametrize('value', BAD_CURSORS)
+def test_bad_cursor_answers_400(cursor, value):
+    response = appmod.app.test_client().get('/videos', query_string={'cursor': value})
+    assert response.status_code == 400
+    assert response.json == {'error': 'Invalid cursor'}
+
+def stats_from_triggers(cursor):
+    cursor.execute('SELECT filter, video_count, total_bytes FROM video_stats WHERE video_count > 0 ORDER BY filter')
+    return cursor.fetchall()
+
+def stats_from_videos(cursor):
+    cursor.execute('''
+        SELECT COALESCE(filter, ''), COUNT(*), COALESCE(SUM(size_bytes), 0) FROM videos
+        WHERE is_deleted = 0 GROUP BY COALESCE(filter, '') ORDER BY 1
+    ''')
+    return cursor.fetchall()
+
+def assert_stats_match(cursor):
+    assert stats_from_triggers(cursor) == stats_from_videos(cursor)
+    total_videos, total_bytes = cursor.execute(
+        'SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM videos WHERE is_deleted = 0').fetchone()
+    assert library_stats(cursor) == {'total_videos': total_videos, 'total_filters': len(stats_from_videos(cursor)),
+                                     'total_bytes': total_bytes}
+
+def test_video_stats_triggers_follow_every_change(cursor):
+    assert_stats_match(cursor)
+    steps = [
+        ("INSERT INTO videos (id, filter, size_bytes, created_at, is_deleted) VALUES ('n1', 'edge', 50, 'x', 0)", ()),
+        ("INSERT INTO videos (id, filter, size_bytes, created_at, is_deleted) VALUES ('n2', NULL, NULL, 'x', 0)", ()),
+        ("INSERT INTO videos (id, filter, size_bytes, created_at, is_deleted) VALUES ('n3', 'blur', 70, 'x', 1)", ()),
+        ('UPDATE videos SET is_deleted = 1 WHERE id = ?', ('v2',)),
+        ('UPDATE videos SET is_deleted = 0 WHERE id = ?', ('v4',)),
+        ('UPDATE videos SET filter = ? WHERE id = ?', ('sepia', 'v1')),
+        ('UPDATE videos SET size_bytes = ? WHERE id = ?', (1234, 'v3')),
+        ('UPDATE videos SET filter = ?, size_bytes = ? WHERE id = ?', ('edge', 10, 'n2')),
+        # Registro removido do banco, ativo e já na lixeira
+        ('DELETE FROM videos WHERE id = ?', ('v5',)),
+        ('DELETE FROM videos WHERE id = ?', ('v2',)),
+        ('DELETE FROM videos WHERE filter = ?', ('grayscale',)),
+    ]
+    for sql, params in steps:
+        cursor.execute(sql, params)
+        assert_stats_match(cursor)
+
+def test_video_stats_rebuilt_on_startup(cursor):
+    # Banco com a tabela de resumo desatualizada (ex.: anterior aos triggers)
+    cursor.execute('UPDATE video_stats SET video_count = 99, total_bytes = 1')
+    cursor.connection.commit()
+    appmod.init_database()
+    assert_stats_match(get_connection().cursor())
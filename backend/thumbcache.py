@@ -0,0 +1,124 @@
+import os
+import time
+import uuid
+import cv2
+
+from config import THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BYTES, THUMBNAIL_CACHE_TOUCH_INTERVAL
+
+# Formatos aceitos em ?fmt= e a extensão/qualidade usadas pelo cv2.imencode
+THUMBNAIL_FORMATS = {
+    'webp': ('.webp', [cv2.IMWRITE_WEBP_QUALITY, 80], 'image/webp'),
+    'jpeg': ('.jpg', [cv2.IMWRITE_JPEG_QUALITY, 85], 'image/jpeg'),
+    'png': ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 6], 'image/png'),
+}
+THUMBNAIL_FORMAT_ALIASES = {'jpg': 'jpeg'}
+MAX_THUMBNAIL_DIMENSION = 1024
+
+def init_thumbnail_cache_table(cursor):
+    # Uma linha por versão redimensionada em disco; last_access ordena a remoção (LRU)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS thumbnail_cache (
+            key TEXT PRIMARY KEY,
+            path TEXT,
+            size_bytes INTEGER,
+            source_mtime INTEGER,
+            last_access REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_thumbnail_cache_access ON thumbnail_cache (last_access)')
+
+def parse_thumbnail_size(width, height, fmt):
+    # ?w=&h=&fmt=: dimensão omitida segue a proporção da thumbnail; sem nenhuma, só converte o formato
+    fmt = THUMBNAIL_FORMAT_ALIASES.get(fmt, fmt) or 'jpeg'
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"fmt must be one of: {', '.join(THUMBNAIL_FORMATS)}")
+    for name, value in (('w', width), ('h', height)):
+        if value is not None and not 1 <= value <= MAX_THUMBNAIL_DIMENSION:
+            raise ValueError(f"{name} must be between 1 and {MAX_THUMBNAIL_DIMENSION}")
+    return width, height, fmt
+
+def thumbnail_mimetype(fmt):
+    return THUMBNAIL_FORMATS[fmt][2]
+
+def _resize(image, width, height):
+    source_height, source_width = image.shape[:2]
+    if width is None and height is None:
+        return image
+    if width is None:
+        width = max(1, round(source_width * height / source_height))
+    elif height is None:
+        height = max(1, round(source_height * width / source_width))
+    else:
+        # Tamanho exato sem distorcer: escala para cobrir e corta o centro
+        scale = max(width / source_width, height / source_height)
+        cover_width = max(width, round(source_width * scale))
+        cover_height = max(height, round(source_height * scale))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        image = cv2.resize(image, (cover_width, cover_height), interpolation=interpolation)
+        left, top = (cover_width - width) // 2, (cover_height - height) // 2
+        return image[top:top + height, left:left + width]
+    interpolation = cv2.INTER_AREA if width < source_width else cv2.INTER_CUBIC
+    return cv2.resize(image, (width, height), interpolation=interpolation)
+
+def resized_thumbnail(conn, video_id, thumb_type, source_path, width, height, fmt):
+    # Devolve o caminho da versão (id, tipo, tamanho, formato), gerando e guardando no cache se preciso;
+    # None se a thumbnail de origem não puder ser lida (arquivo truncado ou corrompido)
+    key = f"{video_id}:{thumb_type}:{width or ''}x{height or ''}:{fmt}"
+    source_mtime = os.stat(source_path).st_mtime_ns
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute('SELECT path, source_mtime, last_access FROM thumbnail_cache WHERE key = ?', (key,))
+    row = cursor.fetchone()
+    if row and row[1] == source_mtime and os.path.exists(row[0]):
+        # Acessos seguidos não regravam a linha a cada requisição
+        if now - row[2] >= THUMBNAIL_CACHE_TOUCH_INTERVAL:
+            cursor.execute('UPDATE thumbnail_cache SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+        return row[0]
+
+    image = cv2.imread(source_path)
+    if image is None:
+        return None
+    extension, params, _ = THUMBNAIL_FORMATS[fmt]
+    ok, data = cv2.imencode(extension, _resize(image, width, height), params)
+    if not ok:
+        raise ValueError(f"Could not encode {fmt}")
+
+    cache_dir = os.path.join(THUMBNAIL_CACHE_DIR, video_id[:2])
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{video_id}_{thumb_type}_{width or ''}x{height or ''}{extension}")
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    with open(temp_path, 'wb') as f:
+        f.write(data.tobytes())
+    os.replace(temp_path, path)
+
+    cursor.execute('''
+        INSERT INTO thumbnail_cache (key, path, size_bytes, source_mtime, last_access) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (key) DO UPDATE SET path = excluded.path, size_bytes = excluded.size_bytes,
+            source_mtime = excluded.source_mtime, last_access = excluded.last_access
+    ''', (key, path, len(data), source_mtime, now))
+    evict_thumbnails(cursor, keep=key)
+    conn.commit()
+    return path
+
+def evict_thumbnails(cursor, max_bytes=THUMBNAIL_CACHE_BYTES, keep=None):
+    # Remove as versões menos acessadas até o total caber em max_bytes
+    cursor.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM thumbnail_cache')
+    excess = cursor.fetchone()[0] - max_bytes
+    if excess <= 0:
+        return 0
+
+    evicted = []
+    cursor.execute('SELECT key, path, size_bytes FROM thumbnail_cache WHERE key != ? ORDER BY last_access',
+                   (keep or '',))
+    for key, path, size_bytes in cursor:
+        if excess <= 0:
+            break
+        evicted.append(key)
+        excess -= size_bytes
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    cursor.executemany('DELETE FROM thumbnail_cache WHERE key = ?', [(key,) for key in evicted])
+    return len(evicted)
@@ -0,0 +1,135 @@
+import json
+import base64
+import binascii
+
+VIDEO_COLUMNS = ('id', 'original_name', 'original_ext', 'mime_type', 'size_bytes', 'duration_sec', 'fps',
+                 'width', 'height', 'filter', 'created_at', 'path_original', 'path_processed',
+                 'is_deleted', 'deleted_at', 'checksum', 'checksum_blake2b')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def video_to_dict(row, columns=VIDEO_COLUMNS):
+    return dict(zip(columns, row))
+
+def encode_cursor(created_at, video_id):
+    # Cursor opaco: posição (created_at, id) do último item da página
+    return base64.urlsafe_b64encode(json.dumps([created_at, video_id]).encode()).decode()
+
+def decode_cursor(value):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(value.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    # Vem do cliente: só um par de strings pode entrar na comparação (created_at, id)
+    if not isinstance(position, list) or len(position) != 2 or not all(isinstance(item, str) for item in position):
+        raise ValueError('Invalid cursor')
+    created_at, video_id = position
+    return created_at, video_id
+
+def parse_fields(value):
+    if not value:
+        return VIDEO_COLUMNS
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in VIDEO_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def list_videos_page(cursor, fields=VIDEO_COLUMNS, limit=DEFAULT_PAGE_SIZE, after=None, filter_type=None,
+                     created_after=None, created_before=None, min_size=None, max_size=None):
+    # Paginação por chave (created_at, id) sobre idx_videos_deleted_created: o custo depende
+    # do tamanho da página, não do tamanho da biblioteca
+    conditions = ['is_deleted = 0']
+    params = []
+    if after:
+        conditions.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+    if filter_type:
+        conditions.append('filter = ?')
+        params.append(filter_type)
+    if created_after:
+        conditions.append('created_at >= ?')
+        params.append(created_after)
+    if created_before:
+        conditions.append('created_at < ?')
+        params.append(created_before)
+    if min_size is not None:
+        conditions.append('size_bytes >= ?')
+        params.append(min_size)
+    if max_size is not None:
+        conditions.append('size_bytes <= ?')
+        params.append(max_size)
+
+    # id e created_at sempre são lidos para montar o próximo cursor
+    selected = tuple(dict.fromkeys(('id', 'created_at') + tuple(fields)))
+    cursor.execute(f'''
+        SELECT {", ".join(selected)} FROM videos
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1])
+    rows = cursor.fetchall()
+
+    videos = []
+    for row in rows[:limit]:
+        video = video_to_dict(row, selected)
+        videos.append({field: video[field] for field in fields})
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0])
+    return videos, next_cursor
+
+def init_video_stats(cursor):
+    # Agregados do painel mantidos por triggers: ler as estatísticas não varre a tabela videos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_stats (
+            filter TEXT PRIMARY KEY,
+            video_count INTEGER NOT NULL DEFAULT 0,
+            total_bytes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_video_stats_insert AFTER INSERT ON videos
+        BEGIN
+            INSERT INTO video_stats (filter, video_count, total_bytes)
+            SELECT COALESCE(NEW.filter, ''), 1, COALESCE(NEW.size_bytes, 0) WHERE NEW.is_deleted = 0
+            ON CONFLICT (filter) DO UPDATE SET video_count = video_count + 1,
+                                               total_bytes = total_bytes + excluded.total_bytes;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_video_stats_update AFTER UPDATE OF is_deleted, filter, size_bytes ON videos
+        BEGIN
+            UPDATE video_stats SET video_count = video_count - 1,
+                                   total_bytes = total_bytes - COALESCE(OLD.size_bytes, 0)
+            WHERE filter = COALESCE(OLD.filter, '') AND OLD.is_deleted = 0;
+            INSERT INTO video_stats (filter, video_count, total_bytes)
+            SELECT COALESCE(NEW.filter, ''), 1, COALESCE(NEW.size_bytes, 0) WHERE NEW.is_deleted = 0
+            ON CONFLICT (filter) DO UPDATE SET video_count = video_count + 1,
+                                               total_bytes = total_bytes + excluded.total_bytes;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_video_stats_delete AFTER DELETE ON videos
+        BEGIN
+            UPDATE video_stats SET video_count = video_count - 1,
+                                   total_bytes = total_bytes - COALESCE(OLD.size_bytes, 0)
+            WHERE filter = COALESCE(OLD.filter, '') AND OLD.is_deleted = 0;
+        END
+    ''')
+    # Reconstruído na inicialização: cobre bancos anteriores aos triggers
+    cursor.execute('DELETE FROM video_stats')
+    cursor.execute('''
+        INSERT INTO video_stats (filter, video_count, total_bytes)
+        SELECT COALESCE(filter, ''), COUNT(*), COALESCE(SUM(size_bytes), 0)
+        FROM videos WHERE is_deleted = 0 GROUP BY COALESCE(filter, '')
+    ''')
+
+def library_stats(cursor):
+    cursor.execute('''
+        SELECT COALESCE(SUM(video_count), 0), COUNT(*), COALESCE(SUM(total_bytes), 0)
+        FROM video_stats WHERE video_count > 0
+    ''')
+    total_videos, total_filters, total_bytes = cursor.fetchone()
+    return {'total_videos': total_videos, 'total_filters': total_filters, 'total_bytes': total_bytes}
@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import itertools
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+import http.client
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Vídeos sintéticos: (nome, largura, altura, duração em segundos, com áudio)
+VIDEO_MATRIX = [
+    ('360p', 640, 360, 4, True),
+    ('720p', 1280, 720, 4, True),
+    ('720p_mute', 1280, 720, 4, False),
+    ('1080p', 1920, 1080, 4, True),
+    # Clipes longos: custos fixos (probe, split, concat, subida dos processos) diluídos como em uploads reais
+    ('720p_30s', 1280, 720, 30, True),
+    ('720p_120s', 1280, 720, 120, True),
+]
+QUICK_MATRIX = [('360p', 640, 360, 2, True), ('360p_mute', 640, 360, 2, False)]
+FILTERS = ['grayscale', 'blur', 'edge', 'brightness', 'sepia', 'blur(sigma=3)|edge']
+# Modo de processamento: passada única ou segmentos filtrados em paralelo e concatenados
+MODES = ['single', 'segmented']
+KERNEL_FRAMES = 30
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks de filtros, pipeline e endpoints HTTP")
+    parser.add_argument('--output', default=None, help="arquivo JSON de saída (padrão: benchmarks/results/<data>.json)")
+    parser.add_argument('--baseline', default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="queda relativa tolerada antes de acusar regressão")
+    parser.add_argument('--quick', action='store_true', help="matriz reduzida (só 360p, 2 s)")
+    parser.add_argument('--only', default='kernels,filters,upload,http',
+                        help="seções a executar, separadas por vírgula")
+    parser.add_argument('--modes', default=','.join(MODES),
+                        help="modos de processamento medidos em filters e upload, separados por vírgula")
+    parser.add_argument('--concurrency', type=int, default=8, help="clientes simultâneos no teste HTTP")
+    parser.add_argument('--requests', type=int, default=200, help="requisições por endpoint no teste HTTP")
+    parser.add_argument('--work-dir', default=None, help="diretório de trabalho (padrão: temporário)")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    return parser.parse_args()
+
+def ffmpeg_bin():
+    return os.environ.get("FFMPEG_BIN", "ffmpeg")
+
+def generate_video(path, width, height, duration, audio):
+    # testsrc2 + senoide: conteúdo determinístico, gerado localmente sem rede
+    args = [ffmpeg_bin(), '-v', 'error', '-y',
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=30:duration={duration}']
+    if audio:
+        args += ['-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+                 '-c:a', 'aac', '-b:a', '128k']
+    args += ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-g', '30', path]
+    subprocess.run(args, check=True)
+
+def prepare_videos(videos_dir, matrix):
+    os.makedirs(videos_dir, exist_ok=True)
+    videos = {}
+    for name, width, height, duration, audio in matrix:
+        path = os.path.join(videos_dir, f"{name}.mp4")
+        if not os.path.exists(path):
+            generate_video(path, width, height, duration, audio)
+        videos[name] = path
+    return videos
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+def read_frames(path, count):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+def bench_kernels(videos):
+    from filters import FrameFilter, parse_chain
+
+    # Só o kernel NumPy/OpenCV, sem decode/encode: frames por segundo em memória
+    results = {}
+    resolutions = set()
+    for name, path in videos.items():
+        frames = read_frames(path, 4)
+        if frames[0].shape in resolutions:
+            continue
+        resolutions.add(frames[0].shape)
+        height, width = frames[0].shape[:2]
+        for filter_type in FILTERS:
+            frame_filter = FrameFilter(parse_chain(filter_type), height, width)
+            frame_filter(frames[0])
+            started = time.perf_counter()
+            for i in range(KERNEL_FRAMES):
+                frame_filter(frames[i % len(frames)])
+            elapsed = time.perf_counter() - started
+            results[f"{name}/{filter_type}"] = {'fps': round(KERNEL_FRAMES / elapsed, 2)}
+    return results
+
+def run_filter(processing, mode, path, output_path, filter_type, duration):
+    if mode == 'segmented':
+        # Mesmo número de segmentos que o job usaria para um upload com mode=segmented
+        num_segments = processing.choose_segment_count(mode, duration)
+        processing.apply_filter_segmented(path, output_path, filter_type, num_segments)
+    else:
+        processing.apply_filter(path, output_path, filter_type)
+
+def bench_filters(videos, work_dir, modes):
+    import processing
+
+    results = {}
+    output_path = os.path.join(work_dir, 'filter_out.mp4')
+    native_setting = processing.FFMPEG_NATIVE_FILTERS
+    try:
+        for name, path in videos.items():
+            info = processing.probe_video(path)
+            frames = info['frames']
+            for mode in modes:
+                for engine, native in (('native', True), ('frame', False)):
+                    processing.FFMPEG_NATIVE_FILTERS = native
+                    for filter_type in FILTERS:
+                        elapsed = timed(run_filter, processing, mode, path, output_path, filter_type,
+                                        info['duration'])
+                        results[f"{name}/{mode}/{engine}/{filter_type}"] = {
+                            'seconds': round(elapsed, 4),
+                            'fps': round(frames / elapsed, 2),
+                        }
+    finally:
+        processing.FFMPEG_NATIVE_FILTERS = native_setting
+    return results
+
+def encode_multipart(fields, file_field, file_path):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for key, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    parts.append((f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                  f'filename="{os.path.basename(file_path)}"\r\nContent-Type: video/mp4\r\n\r\n').encode()
+                 + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+def wait_for_job(port, job_id):
+    while True:
+        status, body = request(port, 'GET', f'/jobs/{job_id}')
+        job = json.loads(body)['job']
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+
+def bench_upload(videos, port, modes):
+    # Ponta a ponta: POST /upload até o 202 e até o job terminar
+    results = {}
+    for name, path in videos.items():
+        for mode, filter_type in itertools.product(modes, ('grayscale', 'sepia')):
+            body, content_type = encode_multipart({'filter': filter_type, 'mode': mode}, 'video', path)
+            started = time.perf_counter()
+            status, response = request(port, 'POST', '/upload', body, {'Content-Type': content_type})
+            accepted = time.perf_counter() - started
+            if status != 202:
+                raise RuntimeError(f"upload falhou ({status}): {response[:200]}")
+            job = wait_for_job(port, json.loads(response)['job_id'])
+            if job['status'] != 'done':
+                raise RuntimeError(f"job falhou: {job['error']}")
+            total = time.perf_counter() - started
+            results[f"{name}/{mode}/{filter_type}"] = {
+                'accept_seconds': round(accepted, 4),
+                'total_seconds': round(total, 4),
+                'upload_mb_per_s': round(len(body) / accepted / 1024 ** 2, 2),
+            }
+    return results
+
+def load_test(port, path, total_requests, concurrency):
+    latencies = []
+    transferred = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                conn.request('GET', path)
+                response = conn.getresponse()
+                size = len(response.read())
+                elapsed = time.perf_counter() - started
+                if response.status != 200:
+                    raise RuntimeError(f"GET {path} respondeu {response.status}")
+                with lock:
+                    latencies.append(elapsed)
+                    transferred[0] += size
+        finally:
+            conn.close()
+
+    per_worker = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0)
+                  for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, count) for count in per_worker if count]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests_per_s': round(len(latencies) / elapsed, 2),
+        'mb_per_s': round(transferred[0] / elapsed / 1024 ** 2, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+    }
+
+def bench_http(port, total_requests, concurrency):
+    status, body = request(port, 'GET', '/videos?limit=1&fields=id')
+    videos = json.loads(body)['videos']
+    if not videos:
+        raise RuntimeError("nenhum vídeo para o teste HTTP; rode a seção upload antes")
+    video_id = videos[0]['id']
+    return {
+        'videos_page': load_test(port, '/videos?limit=50', total_requests, concurrency),
+        'download': load_test(port, f'/download/{video_id}', total_requests, concurrency),
+        'thumbnail': load_test(port, f'/thumbnail/{video_id}/processed', total_requests, concurrency),
+    }
+
+def start_server(app):
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def environment_info():
+    ffmpeg_version = subprocess.run([ffmpeg_bin(), '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=BACKEND_DIR).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version,
+    }
+
+# Métricas em que valores maiores são melhores; as demais (tempos, latências) são melhores menores
+HIGHER_IS_BETTER = ('fps', 'requests_per_s', 'mb_per_s', 'upload_mb_per_s')
+
+def flatten(results, prefix=''):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}/")
+        else:
+            yield f"{prefix}{key}", value
+
+def compare(current, baseline, tolerance):
+    baseline_values = dict(flatten(baseline['results']))
+    regressions = []
+    for key, value in flatten(current['results']):
+        previous = baseline_values.get(key)
+        if not previous or not isinstance(value, (int, float)):
+            continue
+        ratio = value / previous
+        higher_is_better = key.rsplit('/', 1)[-1] in HIGHER_IS_BETTER
+        change = ratio - 1 if higher_is_better else 1 - ratio
+        marker = ''
+        if change < -tolerance:
+            marker = '  << REGRESSÃO'
+            regressions.append(key)
+        print(f"{key:60s} {previous:>12} -> {value:>12} ({change:+.1%}){marker}")
+    return regressions
+
+def main():
+    args = parse_args()
+    sections = set(args.only.split(','))
+    modes = [mode for mode in args.modes.split(',') if mode]
+    if not set(modes) <= set(MODES):
+        raise SystemExit(f"--modes aceita: {', '.join(MODES)}")
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix='video_bench_'))
+    os.makedirs(work_dir, exist_ok=True)
+
+    # O backend lê a configuração do ambiente na importação: banco e mídia isolados no diretório de trabalho
+    os.environ.setdefault('MEDIA_ROOT', os.path.join(work_dir, 'media'))
+    os.environ.setdefault('DATABASE_PATH', os.path.join(work_dir, 'data', 'videos.db'))
+    os.environ.setdefault('JOB_POLL_INTERVAL', '0.05')
+    sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+    videos = prepare_videos(os.path.join(work_dir, 'videos'), QUICK_MATRIX if args.quick else VIDEO_MATRIX)
+    report = {'environment': environment_info(), 'results': {}}
+
+    if 'kernels' in sections:
+        print("Kernels de filtro...")
+        report['results']['kernels'] = bench_kernels(videos)
+    if 'filters' in sections:
+        print("apply_filter por filtro...")
+        report['results']['filters'] = bench_filters(videos, work_dir, modes)
+
+    if sections & {'upload', 'http'}:
+        import app as backend
+        from jobs import start_worker_pool, stop_worker_pool
+        from metrics import reset_metrics_dir
+        reset_metrics_dir()
+        backend.init_database()
+        workers = start_worker_pool()
+        server = start_server(backend.app)
+        try:
+            if 'upload' in sections:
+                print("Upload ponta a ponta...")
+                report['results']['upload'] = bench_upload(videos, server.server_port, modes)
+            if 'http' in sections:
+                print("Carga HTTP...")
+                report['results']['http'] = bench_http(server.server_port, args.requests, args.concurrency)
+        finally:
+            server.shutdown()
+            stop_worker_pool(workers)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                         f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados gravados em {output}")
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,189 @@ from PIL import Image, ImageTk
 import io
 import urllib3
 import ssl
+import time
+import json
+import re
+import queue
+import shutil
+import itertools
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Desabilitar avisos de SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # url_server = "https://api_sd3.kuatech.com.br"
 url_server = "http://127.0.0.1:9981"
+JOB_POLL_SECONDS = 2
+# Atualizações em tempo real via /events (SSE); sem conexão, o andamento do job volta a ser consultado
+EVENTS_READ_TIMEOUT = 60
+EVENTS_RECONNECT_SECONDS = 3
+EVENTS_FINISHED_JOBS = 100
+FILTER_PRESETS = ["grayscale", "blur", "edge", "brightness", "sepia", "blur(sigma=3)|edge", "grayscale|brightness(amount=30)"]
+
+# Histórico paginado: só os campos exibidos nos cards
+HISTORY_PAGE_SIZE = 50
+HISTORY_FIELDS = ("id", "original_name", "width", "height", "filter")
+# Histórico virtualizado: altura fixa dos cards, cards extras montados fora da área visível
+# e distância do fim da lista que dispara a busca da próxima página
+HISTORY_CARD_HEIGHT = 110
+HISTORY_OVERSCAN = 3
+HISTORY_PREFETCH = 10
+# Thumbnails dos cards já vêm do servidor no tamanho exato
+THUMBNAIL_SIZE = (120, 80)
+THUMBNAIL_FORMAT = "webp"
+
+# Upload em blocos retomável
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_PARALLELISM = 4
+UPLOAD_RETRIES = 3
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".video_processor")
+UPLOAD_STATE_PATH = os.path.join(STATE_DIR, "uploads.json")
+
+# Thumbnails: pool fixo de downloads e cache em disco entre execuções (LRU por bytes)
+THUMBNAIL_WORKERS = 4
+THUMBNAIL_CACHE_DIR = os.path.join(STATE_DIR, "thumbnails")
+THUMBNAIL_CACHE_BYTES = 64 * 1024 * 1024
+THUMBNAIL_MEMORY_ITEMS = 300
+
+# Vídeos baixados para assistir: cache em disco (LRU por bytes) revalidado com If-None-Match;
+# arquivos grandes vêm em faixas (Range) paralelas escritas direto na posição certa do arquivo
+MEDIA_CACHE_DIR = os.path.join(STATE_DIR, "media")
+MEDIA_CACHE_BYTES = 2 * 1024 ** 3
+MEDIA_RANGE_SIZE = 16 * 1024 * 1024
+MEDIA_PARALLELISM = 4
+MEDIA_BUFFER_SIZE = 1024 * 1024
+
+# Players usados para abrir streams HLS, em ordem de preferência
+HLS_PLAYERS = ("mpv", "vlc", "ffplay")
+
+class DiskCache:
+    # Arquivos (thumbnails, vídeos) com o ETag e a validade (max-age) da resposta; os menos usados saem primeiro
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.dirty = False
+        try:
+            with open(self.index_path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        # (bytes, etag, ainda válido?) ou None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry['last_access'] = time.time()
+            self.dirty = True
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        return data, entry['etag'], time.time() < entry['expires']
+
+    def lookup(self, key):
+        # Como get, mas devolve o caminho em vez de ler o arquivo (vídeos são abertos pelo player)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            try:
+                complete = os.path.getsize(self._path(key)) == entry['size']
+            except OSError:
+                complete = False
+            if not complete:
+                self.entries.pop(key)
+                self.dirty = True
+                return None
+            entry['last_access'] = time.time()
+            self.dirty = True
+            return self._path(key), entry['etag'], time.time() < entry['expires']
+
+    def temp_path(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        return f"{self._path(key)}.{threading.get_ident()}.part"
+
+    def put(self, key, data, etag, max_age):
+        temp_path = self.temp_path(key)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        self.put_file(key, temp_path, etag, max_age)
+
+    def put_file(self, key, temp_path, etag, max_age):
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self._path(key))
+        with self.lock:
+            now = time.time()
+            self.entries[key] = {'etag': etag, 'size': size, 'expires': now + max_age, 'last_access': now}
+            self._evict(keep=key)
+            self.dirty = True
+        return self._path(key)
+
+    def refresh(self, key, max_age):
+        # 304: o conteúdo não mudou, só renova a validade
+        with self.lock:
+            if key in self.entries:
+                self.entries[key]['expires'] = time.time() + max_age
+                self.dirty = True
+
+    def _evict(self, keep=None):
+        total = sum(entry['size'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda key: self.entries[key]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries.pop(key)['size']
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.entries)
+            self.dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.index_path}.{threading.get_ident()}.part"
+        with open(temp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(temp_path, self.index_path)
+
+class HistoryCard:
+    # Widgets de um card, criados uma vez e religados a outro vídeo conforme a lista rola
+    def __init__(self, canvas, placeholder_image):
+        self.frame = ttk.Frame(canvas, padding=10, relief="groove", borderwidth=1)
+        self.thumb_label = ttk.Label(self.frame, image=placeholder_image)
+        self.thumb_label.grid(row=0, column=0, rowspan=2, padx=(0, 10))
+        self.info_label = ttk.Label(self.frame, anchor="w")
+        self.info_label.grid(row=0, column=1, sticky="ew")
+        
+        btn_frame = ttk.Frame(self.frame)
+        btn_frame.grid(row=1, column=1, sticky="w", pady=(5,0))
+        self.play_button = ttk.Button(btn_frame, text="Ver Processado")
+        self.play_button.pack(side=tk.LEFT, padx=(0, 5))
+        self.original_button = ttk.Button(btn_frame, text="Ver Original")
+        self.original_button.pack(side=tk.LEFT)
+        
+        self.frame.columnconfigure(1, weight=1)
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+
+def response_max_age(response):
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else 0
 
 class VideoProcessorClient:
     def __init__(self, root):
@@ -22,8 +200,30 @@ class VideoProcessorClient:
 
         self.server_url = url_server
         self.selected_file_path = None
-        self.thumbnail_cache = {}
-        self.placeholder_image = ImageTk.PhotoImage(Image.new('RGB', (120, 80), '#ddd'))
+        self.thumbnail_cache = OrderedDict()
+        self.thumbnail_disk_cache = DiskCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_BYTES)
+        self.media_cache = DiskCache(MEDIA_CACHE_DIR, MEDIA_CACHE_BYTES)
+        # Pedidos pendentes por vídeo: vários cards do mesmo vídeo geram um único download
+        self.thumbnail_queue = queue.PriorityQueue()
+        self.thumbnail_waiters = {}
+        self.thumbnail_inflight = set()
+        self.thumbnail_lock = threading.Lock()
+        self.thumbnail_order = itertools.count()
+        # Vídeos já carregados do histórico e cards montados (índice -> card) ou livres para reuso
+        self.history_videos = []
+        self.history_cursor = None
+        self.history_loading = False
+        self.history_generation = 0
+        self.history_cards = {}
+        self.free_cards = []
+        self.history_render_pending = False
+        # Stream de eventos: último id recebido (retomada) e jobs cujo andamento aparece no rótulo
+        self.events_connected = False
+        self.last_event_id = None
+        self.watched_jobs = set()
+        self.finished_jobs = OrderedDict()
+        self.upload_state_lock = threading.Lock()
+        self.placeholder_image = ImageTk.PhotoImage(Image.new('RGB', THUMBNAIL_SIZE, '#ddd'))
         
         # Criar sessão personalizada para requests
         self.session = requests.Session()
@@ -46,6 +246,9 @@ class VideoProcessorClient:
             pass
         
         self._setup_ui()
+        for _ in range(THUMBNAIL_WORKERS):
+            self._run_in_thread(self._thumbnail_worker)
+        self._run_in_thread(self._listen_events)
         self._load_history()
 
     def _setup_ui(self):
@@ -60,29 +263,37 @@ class VideoProcessorClient:
         action_frame.pack(fill=tk.X)
         ttk.Button(action_frame, text="Selecionar Vídeo", command=self._select_file).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
         self.filter_var = tk.StringVar(value="grayscale")
-        filters = ["grayscale", "blur", "edge"]
-        filter_menu = ttk.Combobox(action_frame, textvariable=self.filter_var, values=filters, state="readonly")
+        # Editável: aceita cadeias como "blur(sigma=3)|edge"
+        filter_menu = ttk.Combobox(action_frame, textvariable=self.filter_var, values=FILTER_PRESETS)
         filter_menu.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        self.hls_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(action_frame, text="HLS", variable=self.hls_var).pack(side=tk.LEFT, padx=5)
         self.upload_button = ttk.Button(action_frame, text="Enviar", command=self._upload_video, state=tk.DISABLED)
         self.upload_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(5, 0))
         ttk.Separator(main_frame, orient='horizontal').pack(fill='x', pady=10)
 
+        ttk.Label(main_frame, text="Histórico de Vídeos", font=("", 12, "bold")).pack(pady=5, padx=10, anchor="w")
         history_canvas = tk.Canvas(main_frame, borderwidth=0, background="#ffffff", highlightthickness=0)
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=history_canvas.yview)
-        history_canvas.configure(yscrollcommand=scrollbar.set)
-        self.wrapper_frame = ttk.Frame(history_canvas)
-        self.wrapper_frame.grid_columnconfigure(0, weight=1)
-        history_canvas.create_window((0, 0), window=self.wrapper_frame, anchor="nw", tags="wrapper")
-        self.history_frame = ttk.Frame(self.wrapper_frame)
-        self.history_frame.grid(row=0, column=0) 
-        self.wrapper_frame.bind("<Configure>", lambda e: history_canvas.configure(scrollregion=history_canvas.bbox("all")))
+        history_canvas.configure(yscrollcommand=lambda *args: self._on_history_scroll(scrollbar, *args))
+        self.history_canvas = history_canvas
         history_canvas.bind("<Configure>", self._on_canvas_configure)
         history_canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
     def _on_canvas_configure(self, event):
-        canvas = event.widget
-        canvas.itemconfig('wrapper', width=canvas.winfo_width())
+        for card in self.history_cards.values():
+            self.history_canvas.itemconfigure(card.window, width=event.width - 20)
+        self._schedule_history_render()
+
+    def _on_history_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self._schedule_history_render()
+
+    def _schedule_history_render(self):
+        if not self.history_render_pending:
+            self.history_render_pending = True
+            self.root.after_idle(self._render_history)
 
     def _run_in_thread(self, target_func, *args, **kwargs):
         threading.Thread(target=target_func, args=args, kwargs=kwargs, daemon=True).start()
@@ -103,115 +314,511 @@ class VideoProcessorClient:
         self._run_in_thread(self._perform_upload)
 
     def _perform_upload(self):
+        path = self.selected_file_path
+        filter_type = self.filter_var.get()
+        hls = self.hls_var.get()
         try:
-            with open(self.selected_file_path, 'rb') as f:
-                files = {'video': (os.path.basename(self.selected_file_path), f)}
-                data = {'filter': self.filter_var.get()}
-                response = self.session.post(f"{self.server_url}/upload", files=files, data=data, timeout=300)
-            if response.status_code == 200:
-                self.root.after(0, self._load_history)
+            upload_id, ranges = self._open_upload_session(path, filter_type, hls)
+            self._send_missing_chunks(upload_id, path, ranges)
+            # Só o finalize dispara o processamento no servidor
+            response = self.session.post(f"{self.server_url}/uploads/{upload_id}/finalize", timeout=300)
+            if response.status_code in (200, 202):
+                self._forget_upload_session(path, filter_type, hls)
+                job_id = response.json().get('job_id')
+                if job_id and self.events_connected:
+                    # O novo card e o andamento chegam pelo stream de eventos
+                    self.root.after(0, self._watch_job, job_id)
+                else:
+                    self.root.after(0, self._load_history)
+                    if job_id:
+                        self._wait_for_job(job_id)
             else:
                 messagebox.showerror("Erro de Upload", f"O servidor respondeu com erro: {response.text}")
+        except ValueError as e:
+            messagebox.showerror("Erro de Upload", f"Filtro inválido: {e}")
         except requests.exceptions.RequestException as e:
-            messagebox.showerror("Erro de Conexão", f"Não foi possível conectar ao servidor: {e}")
+            messagebox.showerror("Erro de Conexão", f"Não foi possível concluir o envio (ele será retomado no próximo envio): {e}")
         finally:
             self.root.after(0, lambda: self.upload_button.config(state=tk.NORMAL))
 
+    def _upload_key(self, path, filter_type, hls):
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}|{filter_type}|{int(hls)}"
+
+    def _read_upload_state(self):
+        try:
+            with open(UPLOAD_STATE_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_upload_state(self, state):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(UPLOAD_STATE_PATH, 'w') as f:
+            json.dump(state, f)
+
+    def _forget_upload_session(self, path, filter_type, hls):
+        with self.upload_state_lock:
+            state = self._read_upload_state()
+            state.pop(self._upload_key(path, filter_type, hls), None)
+            self._write_upload_state(state)
+
+    def _open_upload_session(self, path, filter_type, hls):
+        key = self._upload_key(path, filter_type, hls)
+        with self.upload_state_lock:
+            upload_id = self._read_upload_state().get(key)
+        
+        # Retoma uma sessão anterior do mesmo arquivo, se o servidor ainda a tiver
+        if upload_id:
+            response = self.session.get(f"{self.server_url}/uploads/{upload_id}", timeout=10)
+            if response.status_code == 200 and response.json()['upload']['status'] == 'open':
+                return upload_id, response.json()['upload']['ranges']
+            # Finalize anterior chegou ao servidor mas a resposta se perdeu: repetir o finalize devolve o job
+            if response.status_code == 200 and response.json()['upload']['status'] == 'finalized':
+                return upload_id, [[0, response.json()['upload']['size_bytes']]]
+        
+        response = self.session.post(f"{self.server_url}/uploads", json={
+            'filename': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'filter': filter_type,
+            'hls': hls,
+        }, timeout=10)
+        if response.status_code == 400:
+            raise ValueError(response.json().get('error'))
+        response.raise_for_status()
+        upload_id = response.json()['upload_id']
+        with self.upload_state_lock:
+            state = self._read_upload_state()
+            state[key] = upload_id
+            self._write_upload_state(state)
+        return upload_id, []
+
+    def _send_missing_chunks(self, upload_id, path, ranges):
+        size = os.path.getsize(path)
+        missing = [offset for offset in range(0, size, UPLOAD_CHUNK_SIZE)
+                   if not any(start <= offset and min(offset + UPLOAD_CHUNK_SIZE, size) <= end
+                              for start, end in ranges)]
+        sent = size - sum(min(UPLOAD_CHUNK_SIZE, size - offset) for offset in missing)
+        
+        with ThreadPoolExecutor(max_workers=UPLOAD_PARALLELISM) as pool:
+            for length in pool.map(lambda offset: self._put_chunk(upload_id, path, offset, size), missing):
+                sent += length
+                status_text = f"Enviando... {sent * 100 // size}%"
+                self.root.after(0, lambda text=status_text: self.file_label.config(text=text))
+
+    def _put_chunk(self, upload_id, path, offset, size):
+        length = min(UPLOAD_CHUNK_SIZE, size - offset)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        
+        for attempt in range(UPLOAD_RETRIES):
+            try:
+                response = self.session.put(f"{self.server_url}/uploads/{upload_id}", data=data,
+                                            headers={'Upload-Offset': str(offset)}, timeout=60)
+                response.raise_for_status()
+                return length
+            except requests.exceptions.RequestException:
+                if attempt == UPLOAD_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def _wait_for_job(self, job_id):
+        # O servidor responde na hora; o filtro roda em segundo plano
+        while True:
+            try:
+                response = self.session.get(f"{self.server_url}/jobs/{job_id}", timeout=10)
+            except requests.exceptions.RequestException:
+                time.sleep(JOB_POLL_SECONDS)
+                continue
+            if response.status_code != 200:
+                return
+            job = response.json()['job']
+            if job['status'] == 'done':
+                self.root.after(0, lambda: self.file_label.config(text="Processamento concluído"))
+                self.root.after(0, self._load_history)
+                return
+            if job['status'] == 'failed':
+                messagebox.showerror("Erro de Processamento", f"Falha ao aplicar o filtro: {job['error']}")
+                return
+            status_text = "Na fila..." if job['status'] == 'queued' else \
+                f"Processando... {job['frames_done']}/{job['frames_total']} frames"
+            self.root.after(0, lambda text=status_text: self.file_label.config(text=text))
+            time.sleep(JOB_POLL_SECONDS)
+
+    def _listen_events(self):
+        # Conexão longa com /events; ao cair, reconecta com Last-Event-ID e recebe o que perdeu
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                with self.session.get(f"{self.server_url}/events", headers=headers, stream=True,
+                                      timeout=(5, EVENTS_READ_TIMEOUT)) as response:
+                    if response.status_code == 200:
+                        self.events_connected = True
+                        self._read_events(response)
+            except requests.exceptions.RequestException:
+                pass
+            self.events_connected = False
+            time.sleep(EVENTS_RECONNECT_SECONDS)
+
+    def _read_events(self, response):
+        event_type, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                # Linha em branco fecha o evento
+                if event_type and data:
+                    self.root.after(0, self._apply_event, event_type, json.loads("\n".join(data)))
+                event_type, data = None, []
+                continue
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "id":
+                self.last_event_id = value
+            elif field == "event":
+                event_type = value
+            elif field == "data":
+                data.append(value)
+
+    def _apply_event(self, event_type, data):
+        video_id = data.get('video_id')
+        if event_type == 'video_added':
+            if not any(video['id'] == video_id for video in self.history_videos):
+                video = data['video']
+                self.history_videos.insert(0, {field: video.get(field) for field in HISTORY_FIELDS})
+                self._release_history_cards()
+        elif event_type == 'video_deleted':
+            videos = [video for video in self.history_videos if video['id'] != video_id]
+            if len(videos) != len(self.history_videos):
+                self.history_videos = videos
+                self._release_history_cards()
+        elif event_type == 'reset':
+            # Eventos perdidos já saíram do log do servidor
+            self._load_history()
+        elif event_type in ('job_progress', 'job_done', 'job_failed'):
+            if event_type == 'job_done' and data.get('kind') == 'process':
+                self._refresh_thumbnail(video_id)
+            self._update_job_status(event_type, data)
+
+    def _refresh_thumbnail(self, video_id):
+        # A thumbnail só existe depois do filtro: cards já montados buscam de novo
+        self.thumbnail_cache.pop(video_id, None)
+        for index, card in self.history_cards.items():
+            if self.history_videos[index]['id'] == video_id:
+                self._request_thumbnail(video_id, card.thumb_label, 0)
+
+    def _watch_job(self, job_id):
+        self.watched_jobs.add(job_id)
+        self.file_label.config(text="Na fila...")
+        # O job pode ter terminado antes de o finalize responder
+        if job_id in self.finished_jobs:
+            self._update_job_status(*self.finished_jobs[job_id])
+
+    def _update_job_status(self, event_type, data):
+        job_id = data['job_id']
+        if event_type != 'job_progress':
+            self.finished_jobs[job_id] = (event_type, data)
+            while len(self.finished_jobs) > EVENTS_FINISHED_JOBS:
+                self.finished_jobs.popitem(last=False)
+        if job_id not in self.watched_jobs:
+            return
+        if event_type == 'job_progress':
+            self.file_label.config(text=f"Processando... {data['frames_done']}/{data['frames_total']} frames")
+        elif event_type == 'job_done':
+            self.watched_jobs.discard(job_id)
+            self.file_label.config(text="Processamento concluído")
+        else:
+            self.watched_jobs.discard(job_id)
+            messagebox.showerror("Erro de Processamento", f"Falha ao aplicar o filtro: {data['error']}")
+
     def _load_history(self):
-        self._run_in_thread(self._fetch_history)
+        # Recomeça da primeira página; os cards montados são só religados, nunca recriados
+        self.history_generation += 1
+        self.history_loading = True
+        self._run_in_thread(self._fetch_history, self.history_generation)
 
-    def _fetch_history(self):
+    def _load_next_history_page(self):
+        if self.history_loading or not self.history_cursor:
+            return
+        self.history_loading = True
+        self._run_in_thread(self._fetch_history, self.history_generation, self.history_cursor)
+
+    def _fetch_history(self, generation, cursor=None):
+        params = {"limit": HISTORY_PAGE_SIZE, "fields": ",".join(HISTORY_FIELDS)}
+        if cursor:
+            params["cursor"] = cursor
+        videos, next_cursor = None, cursor
         try:
-            response = self.session.get(f"{self.server_url}/videos", timeout=10)
+            response = self.session.get(f"{self.server_url}/videos", params=params, timeout=10)
             if response.status_code == 200:
-                videos = response.json().get('videos', [])
-                self.root.after(0, self._populate_history, videos)
+                data = response.json()
+                videos, next_cursor = data.get('videos', []), data.get('next_cursor')
         except requests.exceptions.RequestException:
             print("Não foi possível carregar o histórico. Servidor offline?")
+        self.root.after(0, self._populate_history, generation, videos, next_cursor, cursor is not None)
 
-    def _populate_history(self, videos):
-        for widget in self.history_frame.winfo_children():
-            widget.destroy()
-        
-        ttk.Label(self.history_frame, text="Histórico de Vídeos", font=("", 12, "bold")).pack(pady=5, padx=10, anchor="w")
-
-        for video in videos:
-            self._create_video_card(video)
-            
-    def _create_video_card(self, video_data):
-        video_id, name, _, _, size, dur, _, w, h, filt, date = video_data[:11]
-        
-        card = ttk.Frame(self.history_frame, padding=10, relief="groove", borderwidth=1)
-        card.pack(fill=tk.X, padx=10, pady=5)
+    def _populate_history(self, generation, videos, next_cursor, append):
+        if generation != self.history_generation:
+            # Resposta de um carregamento anterior ao último refresh
+            return
+        self.history_loading = False
+        if videos is None:
+            return
+        if not append:
+            self.history_videos = []
+            self._release_history_cards()
+            self.history_canvas.yview_moveto(0)
+        self.history_videos.extend(videos)
+        self.history_cursor = next_cursor
+        self._schedule_history_render()
 
-        thumb_label = ttk.Label(card, image=self.placeholder_image)
-        thumb_label.grid(row=0, column=0, rowspan=2, padx=(0, 10))
-        self._run_in_thread(self._load_thumbnail, video_id, label=thumb_label)
+    def _release_history_cards(self):
+        # Os índices mudaram: todos os cards voltam ao pool e o render religa os visíveis
+        for card in self.history_cards.values():
+            self.history_canvas.itemconfigure(card.window, state="hidden")
+            self.free_cards.append(card)
+        self.history_cards = {}
+        self._schedule_history_render()
 
-        info_text = f"{name}\nFiltro: {filt} | Resolução: {w}x{h}"
-        ttk.Label(card, text=info_text, anchor="w").grid(row=0, column=1, sticky="ew")
+    def _render_history(self):
+        # Monta só os cards na área visível (mais HISTORY_OVERSCAN de cada lado), reaproveitando os que saíram
+        self.history_render_pending = False
+        canvas = self.history_canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        total = len(self.history_videos)
+        scrollregion = (0, 0, width, total * HISTORY_CARD_HEIGHT)
+        if tuple(int(float(v)) for v in canvas.cget("scrollregion").split()) != scrollregion:
+            canvas.configure(scrollregion=scrollregion)
         
-        btn_frame = ttk.Frame(card)
-        btn_frame.grid(row=1, column=1, sticky="w", pady=(5,0))
+        top = canvas.canvasy(0)
+        visible_first = int(top // HISTORY_CARD_HEIGHT)
+        visible_last = int((top + height) // HISTORY_CARD_HEIGHT) + 1
+        first = max(0, visible_first - HISTORY_OVERSCAN)
+        last = min(total, visible_last + HISTORY_OVERSCAN)
         
-        ttk.Button(btn_frame, text="Ver Processado", command=lambda: self._run_in_thread(self.play_video, video_id)).pack(side=tk.LEFT, padx=(0, 5))
-        ttk.Button(btn_frame, text="Ver Original", command=lambda: self._run_in_thread(self.play_original_video, video_id)).pack(side=tk.LEFT)
+        for index in [index for index in self.history_cards if not first <= index < last]:
+            card = self.history_cards.pop(index)
+            canvas.itemconfigure(card.window, state="hidden")
+            self.free_cards.append(card)
+        for index in range(first, last):
+            if index not in self.history_cards:
+                card = self.free_cards.pop() if self.free_cards else HistoryCard(canvas, self.placeholder_image)
+                self.history_cards[index] = card
+                self._bind_card(card, index, self.history_videos[index],
+                                priority=0 if visible_first <= index < visible_last else 1)
         
-        card.columnconfigure(1, weight=1)
+        # Próxima página só quando a rolagem se aproxima do fim do que já foi carregado
+        if total - last < HISTORY_PREFETCH:
+            self._load_next_history_page()
 
-    def _load_thumbnail(self, video_id, label):
-        if video_id in self.thumbnail_cache:
-            photo = self.thumbnail_cache[video_id]
-        else:
+    def _bind_card(self, card, index, video_data, priority):
+        video_id, name = video_data['id'], video_data['original_name']
+        w, h, filt = video_data['width'], video_data['height'], video_data['filter']
+        
+        card.info_label.config(text=f"{name}\nFiltro: {filt} | Resolução: {w}x{h}")
+        card.play_button.config(command=lambda: self._run_in_thread(self.play_video, video_id))
+        card.original_button.config(command=lambda: self._run_in_thread(self.play_original_video, video_id))
+        self.history_canvas.coords(card.window, 10, index * HISTORY_CARD_HEIGHT + 5)
+        self.history_canvas.itemconfigure(card.window, state="normal", width=self.history_canvas.winfo_width() - 20,
+                                          height=HISTORY_CARD_HEIGHT - 10)
+        self._request_thumbnail(video_id, card.thumb_label, priority)
+
+    def _request_thumbnail(self, video_id, label, priority):
+        with self.thumbnail_lock:
+            # O label pode estar sendo religado: deixa de esperar pela thumbnail do vídeo anterior
+            previous = getattr(label, 'video_id', None)
+            if previous is not None and label in self.thumbnail_waiters.get(previous, ()):
+                self.thumbnail_waiters[previous].remove(label)
+                if not self.thumbnail_waiters[previous]:
+                    del self.thumbnail_waiters[previous]
+            label.video_id = video_id
+        
+        photo = self.thumbnail_cache.get(video_id)
+        if photo is not None:
+            self.thumbnail_cache.move_to_end(video_id)
+            label.config(image=photo)
+            return
+        label.config(image=self.placeholder_image)
+        with self.thumbnail_lock:
+            waiters = self.thumbnail_waiters.setdefault(video_id, [])
+            waiters.append(label)
+            if len(waiters) > 1:
+                return
+        self.thumbnail_queue.put((priority, next(self.thumbnail_order), video_id))
+
+    def _thumbnail_worker(self):
+        while True:
+            _, _, video_id = self.thumbnail_queue.get()
+            with self.thumbnail_lock:
+                # Já baixada, em andamento ou sem nenhum card esperando (todos rolaram para fora da tela)
+                if video_id not in self.thumbnail_waiters or video_id in self.thumbnail_inflight:
+                    continue
+                self.thumbnail_inflight.add(video_id)
+            image = self._fetch_thumbnail(video_id)
+            with self.thumbnail_lock:
+                self.thumbnail_inflight.discard(video_id)
+                labels = self.thumbnail_waiters.pop(video_id, [])
+            self.root.after(0, self._show_thumbnail, video_id, image, labels)
+            if self.thumbnail_queue.empty():
+                self.thumbnail_disk_cache.save()
+
+    def _fetch_thumbnail(self, video_id):
+        # Cache em disco válido: sem rede. Expirado: revalida com If-None-Match (304 sem corpo)
+        params = {"w": THUMBNAIL_SIZE[0], "h": THUMBNAIL_SIZE[1], "fmt": THUMBNAIL_FORMAT}
+        key = f"{video_id}_{THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}.{THUMBNAIL_FORMAT}"
+        cached = self.thumbnail_disk_cache.get(key)
+        data = cached[0] if cached else None
+        if not cached or not cached[2]:
+            headers = {"If-None-Match": cached[1]} if cached and cached[1] else {}
             try:
-                url = f"{self.server_url}/thumbnail/{video_id}/processed"
-                resp = self.session.get(url, timeout=5)
-                if resp.status_code == 200:
-                    img = Image.open(io.BytesIO(resp.content)).resize((120, 80), Image.Resampling.LANCZOS)
-                    photo = ImageTk.PhotoImage(img)
-                    self.thumbnail_cache[video_id] = photo
+                resp = self.session.get(f"{self.server_url}/thumbnail/{video_id}/processed", params=params,
+                                        headers=headers, timeout=5)
+                if resp.status_code == 304 and cached:
+                    self.thumbnail_disk_cache.refresh(key, response_max_age(resp))
+                elif resp.status_code == 200:
+                    data = resp.content
+                    self.thumbnail_disk_cache.put(key, data, resp.headers.get('ETag'), response_max_age(resp))
                 else:
-                    photo = self.placeholder_image
-            except (requests.exceptions.RequestException, IOError):
-                photo = self.placeholder_image
-        
-        self.root.after(0, lambda: label.config(image=photo))
+                    data = None
+            except requests.exceptions.RequestException:
+                pass
+        if data is None:
+            return None
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+        except IOError:
+            return None
 
-    def play_video(self, video_id):
+    def _show_thumbnail(self, video_id, image, labels):
+        # PhotoImage só é criada na thread do Tk
+        photo = self.placeholder_image
+        if image is not None:
+            photo = ImageTk.PhotoImage(image)
+            self.thumbnail_cache[video_id] = photo
+            while len(self.thumbnail_cache) > THUMBNAIL_MEMORY_ITEMS:
+                self.thumbnail_cache.popitem(last=False)
+        for label in labels:
+            if label.winfo_exists() and label.video_id == video_id:
+                label.config(image=photo)
+                label.image = photo
+
+    def _play_hls(self, video_id):
+        # Com um player externo disponível, toca via HLS sem baixar o arquivo inteiro
+        player = next((shutil.which(name) for name in HLS_PLAYERS if shutil.which(name)), None)
+        if not player:
+            return False
+        url = f"{self.server_url}/hls/{video_id}/master.m3u8"
         try:
-            url = f"{self.server_url}/download/{video_id}"
-            response = self.session.get(url, stream=True)
-            if response.status_code == 200:
-                temp_dir = os.path.join(os.path.expanduser("~"), "video_previews")
-                os.makedirs(temp_dir, exist_ok=True)
-                temp_file = os.path.join(temp_dir, f"preview_{video_id[:8]}.mp4")
-                
-                with open(temp_file, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                os.startfile(temp_file)
-            else:
-                messagebox.showerror("Erro", "Não foi possível baixar o vídeo para visualização.")
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Erro de Conexão", f"Falha ao baixar vídeo: {e}")
+            response = self.session.head(url, timeout=5)
+        except requests.exceptions.RequestException:
+            return False
+        if response.status_code != 200:
+            return False
+        subprocess.Popen([player, url])
+        return True
+
+    def play_video(self, video_id):
+        # Cópia local ainda válida toca na hora, sem rede; senão HLS, senão download
+        cached = self.media_cache.lookup(f"{video_id}_processed.mp4")
+        if not (cached and cached[2]) and self._play_hls(video_id):
+            return
+        self._play_media(f"/download/{video_id}", f"{video_id}_processed.mp4",
+                         "Não foi possível baixar o vídeo para visualização.")
             
     def play_original_video(self, video_id):
+        self._play_media(f"/download/{video_id}/original", f"{video_id}_original.mp4",
+                         "Não foi possível encontrar o vídeo original no servidor.")
+
+    def _play_media(self, path, key, not_found_message):
         try:
-            url = f"{self.server_url}/download/{video_id}/original"
-            response = self.session.get(url, stream=True)
-            if response.status_code == 200:
-                temp_dir = os.path.join(os.path.expanduser("~"), "video_previews")
-                os.makedirs(temp_dir, exist_ok=True)
-                temp_file = os.path.join(temp_dir, f"preview_original_{video_id[:8]}.mp4")
-                
-                with open(temp_file, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                os.startfile(temp_file)
-            else:
-                messagebox.showerror("Erro", "Não foi possível encontrar o vídeo original no servidor.")
-        except requests.exceptions.RequestException as e:
+            local_path = self._fetch_media(f"{self.server_url}{path}", key)
+        except (requests.exceptions.RequestException, ValueError) as e:
             messagebox.showerror("Erro de Conexão", f"Falha ao baixar o vídeo: {e}")
+            return
+        if local_path is None:
+            messagebox.showerror("Erro", not_found_message)
+            return
+        os.startfile(local_path)
+
+    def _fetch_media(self, url, key):
+        cached = self.media_cache.lookup(key)
+        if cached and cached[2]:
+            return cached[0]
+        # A primeira faixa já traz o tamanho total (Content-Range). Revalidação vai sem Range: o servidor
+        # avalia o Range antes do If-None-Match e responderia 206 em vez de 304
+        if cached and cached[1]:
+            headers = {"If-None-Match": cached[1]}
+        else:
+            headers = {"Range": f"bytes=0-{MEDIA_RANGE_SIZE - 1}"}
+        temp_path = self.media_cache.temp_path(key)
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+                if response.status_code == 304 and cached:
+                    self.media_cache.refresh(key, response_max_age(response))
+                    self.media_cache.save()
+                    return cached[0]
+                if response.status_code not in (200, 206):
+                    return None
+                etag, max_age = response.headers.get('ETag'), response_max_age(response)
+                match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+                size = int(match.group(1)) if match else None
+                # Sem suporte a Range o servidor manda o arquivo inteiro (200)
+                expected = min(size, MEDIA_RANGE_SIZE) if size else response.headers.get('Content-Length')
+                with open(temp_path, 'wb') as f:
+                    if size:
+                        f.truncate(size)
+                    self._write_body(response, f, expected)
+            if size and size > MEDIA_RANGE_SIZE:
+                self._fetch_ranges(url, temp_path, etag, size)
+            local_path = self.media_cache.put_file(key, temp_path, etag, max_age)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.media_cache.save()
+        return local_path
+
+    def _fetch_ranges(self, url, temp_path, etag, size):
+        offsets = range(MEDIA_RANGE_SIZE, size, MEDIA_RANGE_SIZE)
+        received = MEDIA_RANGE_SIZE
+        with ThreadPoolExecutor(max_workers=MEDIA_PARALLELISM) as pool:
+            for length in pool.map(lambda offset: self._fetch_range(url, temp_path, etag, offset, size), offsets):
+                received += length
+                status_text = f"Baixando... {received * 100 // size}%"
+                self.root.after(0, lambda text=status_text: self.file_label.config(text=text))
+        self.root.after(0, lambda: self.file_label.config(text="Download concluído"))
+
+    def _fetch_range(self, url, temp_path, etag, offset, size):
+        end = min(offset + MEDIA_RANGE_SIZE, size) - 1
+        # If-Range: se o arquivo mudou no meio do download, o servidor manda 200 em vez da faixa
+        headers = {"Range": f"bytes={offset}-{end}"}
+        if etag:
+            headers["If-Range"] = etag
+        for attempt in range(UPLOAD_RETRIES):
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=60) as response:
+                    if response.status_code != 206:
+                        raise ValueError("o vídeo mudou no servidor durante o download")
+                    with open(temp_path, 'r+b') as f:
+                        f.seek(offset)
+                        return self._write_body(response, f, end - offset + 1)
+            except requests.exceptions.RequestException:
+                if attempt == UPLOAD_RETRIES - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def _write_body(self, response, f, expected):
+        written = 0
+        for chunk in response.iter_content(chunk_size=MEDIA_BUFFER_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+        if expected is not None and written != int(expected):
+            raise ValueError("download incompleto")
+        return written
 
 if __name__ == "__main__":
     root = tk.Tk()